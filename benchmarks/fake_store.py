@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import random
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from benchmarks import fixtures
+
+
+class FakeStore:
+    # Локальный сервер, изображающий PS Store: отдаёт страницы поиска, продуктов, концептов
+    # и категорий (синтетические или записанные) с настраиваемыми задержкой и ошибками.
+    #   latency — задержка ответа в секундах (± jitter);
+    #   error_rate — доля ответов 503;
+    #   throttle_rate — доля ответов 429 с заголовком Retry-After.
+    # Страницы отдаются с ETag; на условный запрос с тем же ETag сервер отвечает 304.
+    # Счётчики запросов и ответов по статусам доступны в requests и statuses.
+
+    def __init__(
+            self,
+            latency: float = 0.05,
+            jitter: float = 0.5,
+            error_rate: float = 0.0,
+            throttle_rate: float = 0.0,
+            retry_after: float = 1.0,
+            catalog_titles: Optional[List[str]] = None,
+            recorded: Optional[Dict[str, str]] = None,
+            seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.catalog_titles = catalog_titles or []
+        self.recorded = recorded or {}
+        self.random = random.Random(seed)
+        self.titles: Dict[str, str] = {}
+        self.requests: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+        self.app = web.Application()
+        self.app.router.add_get("/{region}/search/{query}", self.search)
+        self.app.router.add_get("/{region}/product/{product_id}", self.product)
+        self.app.router.add_get("/{region}/concept/{concept_id}", self.concept)
+        self.app.router.add_get("/{region}/category/{category_id}/{page}", self.category)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        # Запускает сервер (port=0 — любой свободный порт) и возвращает его адрес
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def close(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self) -> "FakeStore":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.statuses.clear()
+
+    async def _respond(self, request: web.Request, stage: str, render) -> web.Response:
+        self.requests[stage] = self.requests.get(stage, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            response = web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        elif roll < self.throttle_rate + self.error_rate:
+            response = web.Response(status=503)
+        else:
+            html = self.recorded.get(stage) or render()
+            etag = '"' + hashlib.md5(html.encode("utf-8")).hexdigest() + '"'
+            if request.headers.get("If-None-Match") == etag:
+                response = web.Response(status=304, headers={"ETag": etag})
+            else:
+                response = web.Response(text=html, content_type="text/html", headers={"ETag": etag})
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        return response
+
+    async def search(self, request: web.Request) -> web.Response:
+        region, query = request.match_info["region"], request.match_info["query"]
+        title = query.strip().title()
+        for platform in ("ps5", "ps4"):
+            self.titles[fixtures.product_id(title, platform)] = title
+        return await self._respond(request, "search", lambda: fixtures.search_page(region, query))
+
+    async def product(self, request: web.Request) -> web.Response:
+        pid = request.match_info["product_id"]
+        return await self._respond(request, "product", lambda: fixtures.product_page(pid, self.titles.get(pid)))
+
+    async def concept(self, request: web.Request) -> web.Response:
+        cid = request.match_info["concept_id"]
+        return await self._respond(request, "concept", lambda: fixtures.concept_page(cid))
+
+    async def category(self, request: web.Request) -> web.Response:
+        page = int(request.match_info["page"])
+        return await self._respond(request, "category", lambda: fixtures.category_page(self.catalog_titles, page))
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from html import escape
+from typing import Dict, List, Optional
+
+from constants import CATALOG_CATEGORIES
+
+# Сколько «лишних» продуктов (похожих товаров, рекомендаций) добавляется на страницу продукта,
+# чтобы JSON по объёму был близок к настоящей странице магазина
+PRODUCT_PADDING = 40
+
+# Карточки-«шум» на странице поиска: DLC, валюта, недоступные товары
+SEARCH_NOISE = (
+    ("PS5", "Add-On", "{title} Season Pass"),
+    ("PS4", "Virtual Currency", "{title} Coins Pack"),
+    ("PS5", None, "{title} Unavailable"),
+    ("PS4", "Bundle", "{title} Outfit Bundle"),
+)
+
+
+def product_id(title: str, platform: str = "ps5") -> str:
+    # Стабильный ID продукта для названия, как у настоящих продуктов: EP0000-PPSA00000_00-...
+    digest = hashlib.md5(title.lower().encode("utf-8")).hexdigest().upper()
+    prefix = "PPSA" if platform == "ps5" else "CUSA"
+    return f"EP{digest[:4]}-{prefix}{digest[4:9]}_00-{digest[9:25]}"
+
+
+def concept_id(title: str) -> str:
+    return str(int(hashlib.md5(title.lower().encode("utf-8")).hexdigest()[:7], 16))
+
+
+def _next_data(data: Dict) -> str:
+    # Страница с JSON __NEXT_DATA__; '<' экранируется так же, как это делает магазин
+    payload = json.dumps(data, ensure_ascii=False).replace("<", "\\u003c")
+    return (
+        '<!DOCTYPE html><html><head><title>PlayStation Store</title></head><body>'
+        '<div id="__next"></div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{payload}</script>'
+        '</body></html>'
+    )
+
+
+def _card(region: str, href_id: str, platforms: List[str], product_type: Optional[str], name: str) -> str:
+    tags = "".join(f'<span class="psw-platform-tag">{p}</span>' for p in platforms)
+    type_span = f'<span class="psw-product-tile__product-type">{escape(product_type)}</span>' if product_type else ""
+    return (
+        f'<li><a href="/{region}/product/{href_id}" class="psw-link psw-content-link">'
+        f'<div class="psw-product-tile">{tags}{type_span}'
+        f'<span data-qa="search#productTile0#product-name">{escape(name)}</span></div></a></li>'
+    )
+
+
+def search_page(region: str, query: str) -> str:
+    # Страница поиска: карточки найденной игры для PS5 и PS4 вперемешку с DLC и валютой
+    title = query.strip().title()
+    cards = [
+        _card(region, product_id(title + " noise" + str(i)), [platform], product_type, name.format(title=title))
+        for i, (platform, product_type, name) in enumerate(SEARCH_NOISE[:2])
+    ]
+    cards.append(_card(region, product_id(title, "ps5"), ["PS5", "PS4"], "Full Game", title))
+    cards.append(_card(region, product_id(title, "ps4"), ["PS4"], None, title))
+    cards.extend(
+        _card(region, product_id(title + " noise" + str(i)), [platform], product_type, name.format(title=title))
+        for i, (platform, product_type, name) in enumerate(SEARCH_NOISE[2:], 2)
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>PlayStation Store</title></head><body>'
+        f'<ul class="psw-grid-list">{"".join(cards)}</ul></body></html>'
+    )
+
+
+def _product(pid: str, title: str, languages: Dict[str, List[str]]) -> Dict:
+    return {
+        "__typename": "Product",
+        "id": pid,
+        "name": title,
+        "releaseDate": "2024-01-01T00:00:00Z",
+        "concept": {"__ref": f"Concept:{concept_id(title)}"},
+        "price": {"__typename": "SkuPrice", "basePrice": "69,99 €", "discountedPrice": "49,99 €"},
+        "spokenLanguagesByPlatform": [
+            {"__typename": "SpokenLanguagesByPlatformElement", "platform": "PS5", "spokenLanguages": languages["voice"]},
+            {"__typename": "SpokenLanguagesByPlatformElement", "platform": "PS4", "spokenLanguages": languages["voice"]},
+        ],
+        "screenLanguagesByPlatform": [
+            {"__typename": "ScreenLanguagesByPlatformElement", "platform": "PS5", "screenLanguages": languages["subs"]},
+            {"__typename": "ScreenLanguagesByPlatformElement", "platform": "PS4", "screenLanguages": languages["subs"]},
+        ],
+    }
+
+
+def product_page(pid: str, title: Optional[str] = None) -> str:
+    # Страница продукта: основной продукт с языками и пачка похожих продуктов в Apollo-кэше
+    title = title or pid
+    languages = {"voice": ["en", "fr", "de", "ru"], "subs": ["en", "fr", "de", "ru", "pl", "es", "it", "pt"]}
+    cache = {f"Product:{pid}": _product(pid, title, languages)}
+    for i in range(PRODUCT_PADDING):
+        other = product_id(f"{title} related {i}")
+        cache[f"Product:{other}"] = _product(other, f"{title} Related {i}", {"voice": ["en"], "subs": ["en"]})
+    return _next_data({"props": {"apolloState": cache}, "query": {"productId": pid}})
+
+
+def concept_page(cid: str, title: Optional[str] = None) -> str:
+    # Страница концепта: один продукт с языками, ID продукта берётся из названия
+    title = title or f"Concept {cid}"
+    pid = product_id(title)
+    languages = {"voice": ["en", "ru"], "subs": ["en", "ru", "pl"]}
+    return _next_data({"props": {"apolloState": {f"Product:{pid}": _product(pid, title, languages)}},
+                       "query": {"conceptId": cid}})
+
+
+def category_page(titles: List[str], page: int, size: int = 24) -> str:
+    # Страница категории игр: срез titles для страницы и сведения о числе страниц
+    chunk = titles[(page - 1) * size:page * size]
+    products = [
+        {"__typename": "Product", "id": product_id(title), "name": title,
+         "platforms": ["PS5", "PS4"], "storeDisplayClassification": "FULL_GAME"}
+        for title in chunk
+    ]
+    page_info = {"__typename": "PageInfo", "totalCount": len(titles), "size": size,
+                 "offset": (page - 1) * size, "isLast": page * size >= len(titles)}
+    grid = {"__typename": "CategoryGrid", "products": products, "pageInfo": page_info}
+    return _next_data({"props": {"apolloState": {f"CategoryGrid:{CATALOG_CATEGORIES['ps5']}:{page}": grid}}})
+
+
+def load_recorded(directory: str) -> Dict[str, str]:
+    # Записанные страницы магазина: search.html, product.html, concept.html, category.html.
+    # Найденные файлы отдаются вместо синтетических страниц соответствующего типа.
+    recorded = {}
+    for stage in ("search", "product", "concept", "category"):
+        path = os.path.join(directory, f"{stage}.html")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                recorded[stage] = f.read()
+    return recorded
@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import parsers
+from benchmarks import fixtures
+from benchmarks.fake_store import FakeStore
+from constants import REGIONS, STORE_URL
+from http_cache import HttpCache
+from ps_store_checker import check_multiple_games_languages_md_async, get_languages_async, search_game_async
+from store_client import StoreClient
+
+# Модули, которые нужны каждому бэкенду разбора карточек
+PARSER_BACKENDS = {
+    "selectolax": ("selectolax.lexbor",),
+    "lxml": ("lxml.html",),
+    "bs4": ("bs4",),
+}
+
+
+@contextmanager
+def parser_backend(name: str):
+    # Временно переключает parsers на указанный бэкенд
+    previous = parsers.parser_backend()
+    parsers.PARSER_BACKEND = name
+    try:
+        yield
+    finally:
+        parsers.PARSER_BACKEND = previous
+
+
+def available_backends() -> List[str]:
+    names = []
+    for name, modules in PARSER_BACKENDS.items():
+        try:
+            for module in modules:
+                importlib.import_module(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+# Модули проекта, время импорта которых замеряется, и тяжёлые зависимости,
+# которые не должны загружаться при импорте
+IMPORT_TARGETS = ("constants", "parsers", "store_client", "ps_store_checker", "main")
+HEAVY_MODULES = ("aiohttp", "bs4", "selectolax", "lxml", "pyarrow", "requests")
+
+# Замер в отдельном процессе: время импорта и загруженные тяжёлые зависимости
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def bench_imports(repeat: int) -> List[Dict[str, Any]]:
+    # Время холодного импорта модулей проекта: каждый замер — новый интерпретатор
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for module in IMPORT_TARGETS:
+        timings = []
+        loaded: List[str] = []
+        for _ in range(repeat):
+            probe = IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+            output = subprocess.run(
+                [sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True
+            ).stdout
+            measured = json.loads(output.strip().splitlines()[-1])
+            timings.append(measured["seconds"])
+            loaded = measured["loaded"]
+        timings.sort()
+        results.append({"name": f"import {module}", "items": 1, "best": timings[0],
+                        "median": timings[len(timings) // 2], "loaded": loaded})
+    return results
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    # Время одного вызова: лучшее и медианное из repeat замеров
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {"best": timings[0], "median": timings[len(timings) // 2]}
+
+
+def bench_parsers(repeat: int, recorded: Dict[str, str]) -> List[Dict[str, Any]]:
+    # Разбор страниц поиска и продукта на каждом установленном бэкенде и фильтр карточек
+    search_html = recorded.get("search") or fixtures.search_page("en-pl", "days gone")
+    product_html = recorded.get("product") or fixtures.product_page(fixtures.product_id("Days Gone"), "Days Gone")
+    results = []
+
+    for backend in available_backends():
+        with parser_backend(backend):
+            cards = parsers.extract_product_cards(search_html)
+            results.append({"name": f"extract_product_cards[{backend}]", "items": len(cards),
+                            **measure(lambda: parsers.extract_product_cards(search_html), repeat)})
+            results.append({"name": f"pick_game_match[{backend}]", "items": 1,
+                            **measure(lambda: parsers.pick_game_match(search_html, ("ps5", "ps4"), "Days Gone", "en"),
+                                      repeat)})
+
+    results.append({"name": "parse_product_page", "items": 1,
+                    **measure(lambda: parsers.parse_product_page(product_html), repeat)})
+
+    cards = parsers.extract_product_cards(search_html) * 50
+    for locale in (None, "en", "ru"):
+        results.append({"name": f"is_card_game[{locale or 'all'}]", "items": len(cards),
+                        **measure(lambda: [parsers.is_card_game(card, locale) for card in cards], repeat)})
+    return results
+
+
+async def bench_requests(store: FakeStore, args) -> List[Dict[str, Any]]:
+    # search_game_async и get_languages_async через локальный сервер: каждый запрос уникален,
+    # чтобы не срабатывало запоминание результатов в клиенте
+    results = []
+    for concurrency in args.concurrency:
+        async with StoreClient.create(args.parse_workers, args.rate_limit, concurrency, concurrency,
+                                      base_url=store.url) as client:
+            queries = [f"Benchmark Game {concurrency} {i}" for i in range(args.requests)]
+
+            started = time.perf_counter()
+            matches = await asyncio.gather(*(search_game_async(client, "en-pl", q, ("ps5", "ps4")) for q in queries))
+            elapsed = time.perf_counter() - started
+            results.append({"name": f"search_game_async[c={concurrency}]", "items": len(queries),
+                            "elapsed": elapsed, "rps": len(queries) / elapsed,
+                            "found": sum(1 for match in matches if match)})
+
+            started = time.perf_counter()
+            langs = await asyncio.gather(*(get_languages_async(client, match["url"]) for match in matches if match))
+            elapsed = time.perf_counter() - started
+            results.append({"name": f"get_languages_async[c={concurrency}]", "items": len(langs),
+                            "elapsed": elapsed, "rps": len(langs) / elapsed if elapsed else 0.0,
+                            "found": sum(1 for info in langs if info and info['ps5_voice'])})
+    return results
+
+
+async def bench_end_to_end(store: FakeStore, args, http_cache: Optional[HttpCache] = None) -> List[Dict[str, Any]]:
+    # Полный прогон check_multiple_games_languages_md_async по сетке игры × регионы × параллельность.
+    # С http_cache повторные прогоны той же сетки идут условными запросами
+    results = []
+    for games_count in args.games:
+        for regions_count in args.regions:
+            for concurrency in args.concurrency:
+                games = [f"End To End Game {i}" for i in range(games_count)]
+                regions = REGIONS[:regions_count]
+                store.reset()
+                with tempfile.TemporaryDirectory() as tmp:
+                    output_file = os.path.join(tmp, "games.md")
+                    async with StoreClient.create(args.parse_workers, args.rate_limit, concurrency, concurrency,
+                                                  base_url=store.url, http_cache=http_cache) as client:
+                        started = time.perf_counter()
+                        await check_multiple_games_languages_md_async(
+                            games, regions, ["ps5", "ps4"], ["ru"], output_file, client=client,
+                            schedule=not args.no_schedule
+                        )
+                        elapsed = time.perf_counter() - started
+                    with open(output_file, encoding="utf-8") as f:
+                        rows = sum(1 for line in f if line.startswith("| ") and f"| {STORE_URL}/" in line)
+
+                pairs = games_count * len(regions)
+                results.append({
+                    "name": f"end_to_end[{games_count}x{len(regions)}, c={concurrency}]",
+                    "items": pairs, "elapsed": elapsed, "rps": pairs / elapsed,
+                    "found": rows, "requests": sum(store.requests.values()),
+                    "not_modified": store.statuses.get(304, 0),
+                })
+    return results
+
+
+def print_results(title: str, results: List[Dict[str, Any]]) -> None:
+    print(f"\n{title}")
+    for r in results:
+        if "loaded" in r:
+            print(f"  {r['name']:<40} {r['best'] * 1000:9.3f} мс (медиана {r['median'] * 1000:.3f} мс, "
+                  f"загружены: {', '.join(r['loaded']) or 'нет тяжёлых зависимостей'})")
+        elif "best" in r:
+            print(f"  {r['name']:<40} {r['best'] * 1000:9.3f} мс (медиана {r['median'] * 1000:.3f} мс, "
+                  f"{r['items']} шт.)")
+        else:
+            extra = f", запросов к серверу {r['requests']}, из них 304: {r['not_modified']}" if "requests" in r else ""
+            print(f"  {r['name']:<40} {r['elapsed']:8.2f} с, {r['rps']:8.1f} шт./с "
+                  f"(найдено {r['found']}/{r['items']}{extra})")
+
+
+async def run_async(args, recorded: Dict[str, str]) -> Dict[str, List[Dict[str, Any]]]:
+    results = {}
+    store = FakeStore(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        recorded=recorded,
+        seed=args.seed
+    )
+    async with store:
+        if "requests" in args.suites:
+            results["requests"] = await bench_requests(store, args)
+            print_results("🌐 Запросы через локальный сервер", results["requests"])
+        if "e2e" in args.suites:
+            http_cache = HttpCache(args.http_cache) if args.http_cache else None
+            try:
+                results["e2e"] = await bench_end_to_end(store, args, http_cache)
+            finally:
+                if http_cache:
+                    http_cache.close()
+            print_results("🏁 Полный прогон", results["e2e"])
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки проверки языков без обращения к PS Store")
+    parser.add_argument("--suites", nargs="+", choices=["imports", "parsers", "requests", "e2e"],
+                        default=["imports", "parsers", "requests", "e2e"], help="какие наборы запускать")
+    parser.add_argument("--import-repeat", type=int, default=5, help="запусков интерпретатора на замер импорта")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов для замеров разбора")
+    parser.add_argument("--requests", type=int, default=50, help="запросов в наборе requests")
+    parser.add_argument("--games", type=int, nargs="+", default=[5, 20], help="число игр в полном прогоне")
+    parser.add_argument("--regions", type=int, nargs="+", default=[3, 10], help="число регионов в полном прогоне")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 8, 16], help="уровни параллельности")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="ограничение запросов в секунду")
+    parser.add_argument("--no-schedule", action="store_true", help="полный прогон без планировщика пар")
+    parser.add_argument("--parse-workers", type=int, default=0, help="процессов для разбора HTML")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа сервера, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для ответов 429, с")
+    parser.add_argument("--seed", type=int, default=1, help="seed для задержек и ошибок сервера")
+    parser.add_argument("--fixtures", help="каталог с записанными страницами (search.html, product.html, ...)")
+    parser.add_argument("--http-cache", help="файл HTTP-кэша для полного прогона (условные запросы)")
+    parser.add_argument("--json", help="сохранить результаты в JSON")
+    parser.add_argument("--verbose", action="store_true", help="не приглушать логи проверки")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    recorded = fixtures.load_recorded(args.fixtures) if args.fixtures else {}
+
+    results: Dict[str, Any] = {"parser_backend": parsers.parser_backend()}
+    if "imports" in args.suites:
+        results["imports"] = bench_imports(args.import_repeat)
+        print_results("📦 Импорт модулей (холодный старт)", results["imports"])
+    if "parsers" in args.suites:
+        results["parsers"] = bench_parsers(args.repeat, recorded)
+        print_results(f"🧩 Разбор страниц (по умолчанию: {parsers.parser_backend()})", results["parsers"])
+    if {"requests", "e2e"} & set(args.suites):
+        results.update(asyncio.run(run_async(args, recorded)))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
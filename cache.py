@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from constants import CACHE_FILE, SEARCH_CACHE_TTL, LANGUAGES_CACHE_TTL, CACHE_MAX_ENTRIES, LATENCY_EWMA_WEIGHT
+
+# Режимы обновления кэша:
+#   "stale" — берём свежие записи из кэша, перезапрашиваем только устаревшие (по умолчанию)
+#   "all"   — игнорируем кэш при чтении и перезапрашиваем всё, результаты сохраняем
+#   "never" — используем любые записи из кэша независимо от TTL, запрашиваем только отсутствующие
+REFRESH_MODES = ("stale", "all", "never")
+
+
+class ResultCache:
+    # Постоянный кэш на SQLite:
+    #   search:    (регион, запрос, платформа) -> URL продукта ("" — игра не найдена),
+    #              название найденной игры и уверенность совпадения
+    #   languages: URL продукта -> словарь языков
+    #   region_latency: регион -> скользящая средняя времени загрузки страницы
+    # Размер каждой таблицы ограничен max_entries, лишние записи вытесняются по LRU.
+
+    def __init__(
+            self,
+            path: str = CACHE_FILE,
+            search_ttl: float = SEARCH_CACHE_TTL,
+            languages_ttl: float = LANGUAGES_CACHE_TTL,
+            max_entries: int = CACHE_MAX_ENTRIES,
+            refresh: str = "stale"
+    ):
+        if refresh not in REFRESH_MODES:
+            raise ValueError(f"Неизвестный режим обновления кэша: {refresh}")
+
+        self.path = path
+        self.search_ttl = search_ttl
+        self.languages_ttl = languages_ttl
+        self.max_entries = max_entries
+        self.refresh = refresh
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS search ("
+            "region TEXT, query TEXT, platform TEXT, url TEXT, "
+            "updated_at REAL, accessed_at REAL, "
+            "title TEXT, score REAL, "
+            "PRIMARY KEY (region, query, platform))"
+        )
+        # Кэши прежних версий: колонки совпадения добавляются в существующую таблицу
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(search)")}
+        for column, column_type in (("title", "TEXT"), ("score", "REAL")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE search ADD COLUMN {column} {column_type}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS languages ("
+            "url TEXT PRIMARY KEY, data TEXT, updated_at REAL, accessed_at REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS region_latency ("
+            "region TEXT PRIMARY KEY, seconds REAL, updated_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS search_accessed ON search (accessed_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS languages_accessed ON languages (accessed_at)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _is_usable(self, updated_at: float, ttl: float) -> bool:
+        # Проверяет, можно ли отдать запись из кэша в текущем режиме
+        if self.refresh == "all":
+            return False
+        if self.refresh == "never":
+            return True
+        return time.time() - updated_at < ttl
+
+    def _evict(self, table: str) -> None:
+        # Вытесняет самые давно использованные записи сверх лимита
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def get_search(self, region: str, query: str, platform: str) -> Optional[Dict[str, Any]]:
+        # Совпадение {"url", "title", "score"}; url == "" — игра не найдена
+        key = (region, query.lower().strip(), platform.lower())
+        row = self.conn.execute(
+            "SELECT url, updated_at, title, score FROM search WHERE region = ? AND query = ? AND platform = ?",
+            key
+        ).fetchone()
+        if not row or not self._is_usable(row[1], self.search_ttl):
+            return None
+
+        self.conn.execute(
+            "UPDATE search SET accessed_at = ? WHERE region = ? AND query = ? AND platform = ?",
+            (time.time(),) + key
+        )
+        self.conn.commit()
+        return {"url": row[0], "title": row[2], "score": row[3]}
+
+    def set_search(
+            self,
+            region: str,
+            query: str,
+            platform: str,
+            url: str,
+            title: Optional[str] = None,
+            score: Optional[float] = None
+    ) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO search (region, query, platform, url, updated_at, accessed_at, title, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (region, query.lower().strip(), platform.lower(), url, now, now, title, score)
+        )
+        self._evict("search")
+        self.conn.commit()
+
+    def get_languages(self, url: str) -> Optional[Dict[str, List[str]]]:
+        row = self.conn.execute(
+            "SELECT data, updated_at FROM languages WHERE url = ?", (url,)
+        ).fetchone()
+        if not row or not self._is_usable(row[1], self.languages_ttl):
+            return None
+
+        self.conn.execute("UPDATE languages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+        return json.loads(row[0])
+
+    def set_languages(self, url: str, langs: Dict[str, List[str]]) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO languages VALUES (?, ?, ?, ?)",
+            (url, json.dumps(langs, ensure_ascii=False), now, now)
+        )
+        self._evict("languages")
+        self.conn.commit()
+
+    def is_cached(self, region: str, query: str, platform: str) -> bool:
+        # Есть ли для пары годные записи поиска и языков (для ненайденной игры — только поиска);
+        # время доступа не обновляется
+        row = self.conn.execute(
+            "SELECT s.url, s.updated_at, l.updated_at FROM search s LEFT JOIN languages l ON l.url = s.url "
+            "WHERE s.region = ? AND s.query = ? AND s.platform = ?",
+            (region, query.lower().strip(), platform.lower())
+        ).fetchone()
+        if not row or not self._is_usable(row[1], self.search_ttl):
+            return False
+        return row[0] == "" or (row[2] is not None and self._is_usable(row[2], self.languages_ttl))
+
+    def get_region_latencies(self) -> Dict[str, float]:
+        return dict(self.conn.execute("SELECT region, seconds FROM region_latency").fetchall())
+
+    def update_region_latencies(self, latencies: Dict[str, float], weight: float = LATENCY_EWMA_WEIGHT) -> None:
+        # Обновляет скользящие средние задержек регионов замерами текущего прогона
+        known = self.get_region_latencies()
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO region_latency VALUES (?, ?, ?)",
+            [
+                (region, seconds if region not in known else known[region] + weight * (seconds - known[region]), now)
+                for region, seconds in latencies.items()
+            ]
+        )
+        self.conn.commit()
@@ -0,0 +1,60 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+from title_index import MIN_MATCH_SCORE, TitleIndex, normalize_title
+
+# Классификации продуктов каталога, которые считаются играми
+GAME_CLASSIFICATIONS = {None, "FULL_GAME", "PREMIUM_EDITION", "GAME_BUNDLE"}
+
+
+class CatalogIndex:
+    # Индекс игр одного региона: нормализованное название → продукты (URL и платформы).
+    # Строится один раз по страницам категорий, после чего запросы разрешаются без поиска.
+
+    def __init__(self):
+        self.titles: Dict[str, List[Dict[str, object]]] = {}
+        self.fuzzy = TitleIndex()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, title: str, url: str, platforms: Sequence[str]) -> None:
+        normalized = normalize_title(title)
+        entries = self.titles.get(normalized)
+        if entries is None:
+            entries = self.titles[normalized] = []
+            self.fuzzy.add(title, normalized)
+        for entry in entries:
+            if entry["url"] == url:
+                entry["platforms"] = sorted(set(entry["platforms"]) | set(platforms))
+                return
+        entries.append({"title": title, "url": url, "platforms": sorted(set(platforms))})
+
+    def find(self, query: str, platform: Union[str, Sequence[str]]) -> Optional[Dict[str, Any]]:
+        # Ищет игру и возвращает {"url", "title", "score"}, как pick_game_match: точное совпадение
+        # нормализованного названия (score = 1), иначе лучшие по нечёткому сравнению
+        # названия выше порога уверенности
+        platforms = [platform.lower()] if isinstance(platform, str) else [p.lower() for p in platform]
+
+        entries = self.titles.get(normalize_title(query))
+        if entries:
+            scored = [(1.0, entry) for entry in entries]
+        else:
+            # Названия выше порога уверенности по убыванию оценки; платформа выбирается среди них
+            scored = [
+                (score, entry)
+                for score, _, key in self.fuzzy.rank(query)
+                if score >= MIN_MATCH_SCORE
+                for entry in self.titles[key]
+            ]
+
+        for score, entry in scored:
+            if all(p in entry["platforms"] for p in platforms):
+                return {"url": entry["url"], "title": entry["title"], "score": score}
+        for score, entry in scored:
+            if any(p in entry["platforms"] for p in platforms):
+                return {"url": entry["url"], "title": entry["title"], "score": score}
+        return None
+
+
+# Загрузчик индекса региона: вызывается только если он действительно нужен
+CatalogLoader = Callable[[], Awaitable[CatalogIndex]]
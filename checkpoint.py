@@ -0,0 +1,96 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from constants import CHECKPOINT_FILE, ERROR_MARK
+
+# Ключ выполненной проверки: (игра, регион, платформа, язык)
+CheckpointKey = Tuple[str, str, str, str]
+
+# Сообщение прежних версий, в которых ошибка поиска не отличалась от «игра не найдена»
+AMBIGUOUS_NOT_FOUND = "Игра не найдена или ошибка запроса"
+
+
+# Колонки совпадения между отметками и URL: название найденной игры и уверенность
+MATCH_COLUMNS = 2
+
+
+def mark_columns(platform: str, lang_code: str) -> int:
+    # Число колонок отметок в строке: для каждой платформы наличие и озвучка/субтитры по каждому языку
+    return len(platform.split("+")) * (1 + 2 * len(lang_code.split("+")))
+
+
+def upgrade_row(platform: str, lang_code: str, row: List[str]) -> List[str]:
+    # Строки прежних версий без колонок совпадения дополняются пустыми ячейками
+    if len(row) == 2 + mark_columns(platform, lang_code) + 1:
+        return row[:-1] + [""] * MATCH_COLUMNS + row[-1:]
+    return row
+
+
+def is_completed_row(row: List[str]) -> bool:
+    # Строка — результат проверки, а не сбой: ошибки (и неоднозначные строки прежних
+    # версий) не журналируются и при продолжении перепроверяются
+    return row[2] != ERROR_MARK and row[-1] != AMBIGUOUS_NOT_FOUND
+
+
+class CheckpointJournal:
+    # Append-only журнал выполненных проверок в формате JSONL.
+    # Каждая строка — одна готовая строка таблицы, поэтому прерванный прогон
+    # можно продолжить с resume=True, пропустив уже обработанные пары.
+
+    def __init__(self, path: str = CHECKPOINT_FILE, resume: bool = False):
+        self.path = path
+        self.completed: Dict[CheckpointKey, List[str]] = self.load() if resume else {}
+        if resume and not self._ends_with_newline():
+            # Отделяем оборванный хвост от новых записей
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def _ends_with_newline(self) -> bool:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return True
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def make_key(game: str, region: str, platform: str, lang_code: str) -> CheckpointKey:
+        return game, region, platform.lower(), lang_code
+
+    def load(self) -> Dict[CheckpointKey, List[str]]:
+        # Читает журнал; недописанная последняя строка (обрыв процесса) и строки ошибок пропускаются
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not is_completed_row(entry["row"]):
+                    continue
+                key = self.make_key(entry["game"], entry["region"], entry["platform"], entry["lang"])
+                completed[key] = upgrade_row(entry["platform"], entry["lang"], entry["row"])
+        return completed
+
+    def get(self, game: str, region: str, platform: str, lang_code: str) -> Optional[List[str]]:
+        return self.completed.get(self.make_key(game, region, platform, lang_code))
+
+    def append(self, game: str, region: str, platform: str, lang_code: str, row: List[str]) -> None:
+        if not is_completed_row(row):
+            raise ValueError(f"Строка ошибки не журналируется: {row}")
+        entry = {"game": game, "region": region, "platform": platform.lower(), "lang": lang_code, "row": row}
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.completed[self.make_key(game, region, platform, lang_code)] = row
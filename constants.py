@@ -1,9 +1,26 @@
+import importlib.util
 import random
+from functools import lru_cache
 from typing import Dict
 
-# Maximum number of parallel requests
+# Адрес магазина
+STORE_URL = "https://store.playstation.com"
+
+# Maximum number of parallel requests (начальное значение для адаптивного ограничителя)
 MAX_PARALLEL_REQUESTS = 2
 
+# Верхняя граница параллельных запросов, до которой может дорасти адаптивный ограничитель
+MAX_CONCURRENCY = 16
+
+# Максимальная частота запросов к PS Store (в секунду)
+RATE_LIMIT_PER_SECOND = 5
+
+# Минимальный интервал между уменьшениями параллельности при ошибках (в секундах)
+BACKOFF_INTERVAL = 1
+
+# Число процессов для разбора HTML (0 — разбор в основном потоке)
+PARSE_WORKERS = 0
+
 # Список User-Agent для ротации
 USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
@@ -13,13 +30,20 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 ]
 
+@lru_cache(maxsize=None)
+def accept_encoding() -> str:
+    # br объявляем только если aiohttp сможет его распаковать; проверяется при первом запросе
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
 def get_random_headers() -> Dict[str, str]:
     # Генерирует случайные заголовки для запроса
     return {
         "User-Agent": random.choice(USER_AGENTS),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": accept_encoding(),
         "DNT": "1",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
@@ -30,53 +54,122 @@ def get_random_headers() -> Dict[str, str]:
         "Cache-Control": "max-age=0"
     }
 
-# HTTP-заголовки для запросов (устаревшие, используйте get_random_headers())
-HEADERS = get_random_headers()
-
 # Таймаут запросов в секундах
 REQUEST_TIMEOUT = 5
 
+# Таймаут установки соединения, время жизни кэша DNS и keep-alive соединений (в секундах)
+CONNECT_TIMEOUT = 3
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+
 # Настройки повторных попыток
 RETRY_ATTEMPTS = 5
 RETRY_DELAY = 3
+RETRY_MAX_DELAY = 60
+
+# Настройки постоянного кэша (TTL в секундах)
+CACHE_FILE = "ps_store_cache.sqlite3"
+SEARCH_CACHE_TTL = 7 * 24 * 3600
+LANGUAGES_CACHE_TTL = 24 * 3600
+CACHE_MAX_ENTRIES = 20000
+# Вес нового замера в скользящей средней задержки региона (0..1)
+LATENCY_EWMA_WEIGHT = 0.3
+
+# HTTP-кэш страниц: валидаторы (ETag/Last-Modified) и сжатые тела ответов
+HTTP_CACHE_FILE = "ps_store_http_cache.sqlite3"
+HTTP_CACHE_MAX_ENTRIES = 20000
 
-# Список ключевых "мусорных" типов (многоязычный, можно расширять)
-TRASH_TYPES = [
+# Журнал выполненных проверок для продолжения прерванных прогонов
+CHECKPOINT_FILE = "checkpoint.jsonl"
+
+# Отметка в строке таблицы, если проверка не удалась (ошибка сети, исчерпаны повторы):
+# такие строки не журналируются и не попадают в снимок, чтобы их перепроверить
+ERROR_MARK = "Ошибка"
+
+# Записей в одной группе строк Parquet
+PARQUET_BATCH_SIZE = 10000
+
+# Снимок результатов для режима изменений (время в секундах):
+#   пары, не менявшиеся STABLE_RUNS_TO_SKIP прогонов подряд, пропускаются,
+#   но перепроверяются не реже раза в STABLE_RECHECK_INTERVAL;
+#   игры, изменившиеся или вышедшие за RECENT_PERIOD, проверяются первыми и не пропускаются
+SNAPSHOT_FILE = "snapshot.json"
+STABLE_RUNS_TO_SKIP = 3
+STABLE_RECHECK_INTERVAL = 7 * 24 * 3600
+RECENT_PERIOD = 30 * 24 * 3600
+
+# Ключевые "мусорные" типы по языкам магазина (можно расширять)
+TRASH_TYPES_BY_LANG = {
     # Английский
-    "virtual currency", "credits", "coins", "money", "pack", "item", "skin",
-    "outfit", "weapon", "armor", "dlc", "add-on", "expansion", "season pass",
-    "upgrade", "booster", "demo", "trial", "bundle only", "costume", "level",
+    "en": [
+        "virtual currency", "credits", "coins", "money", "pack", "item", "skin",
+        "outfit", "weapon", "armor", "dlc", "add-on", "expansion", "season pass",
+        "upgrade", "booster", "demo", "trial", "bundle only", "costume", "level",
+    ],
 
     # Русский
-    "валюта", "монеты", "кредиты", "скин", "скины", "набор", "предмет", "оружие",
-    "броня", "дополнение", "доп контент", "доп. контент", "dlc", "бустер",
-    "расширение", "обновление", "апгрейд", "только в составе набора", "демо",
-    "пробная версия", "сезонный пропуск", "season pass", "уровень",
+    "ru": [
+        "валюта", "монеты", "кредиты", "скин", "скины", "набор", "предмет", "оружие",
+        "броня", "дополнение", "доп контент", "доп. контент", "dlc", "бустер",
+        "расширение", "обновление", "апгрейд", "только в составе набора", "демо",
+        "пробная версия", "сезонный пропуск", "season pass", "уровень",
+    ],
 
     # Немецкий
-    "virtuelle währung", "credits", "münzen", "gegenstand", "kostüm",
-    "waffe", "rüstung", "erweiterung", "zusatzinhalt", "addon", "booster",
-    "aufwertung", "testversion", "probeversion", "nur im bundle", "season pass",
-    "stufenpaket", "charakter", "level", "objekt",
+    "de": [
+        "virtuelle währung", "credits", "münzen", "gegenstand", "kostüm",
+        "waffe", "rüstung", "erweiterung", "zusatzinhalt", "addon", "booster",
+        "aufwertung", "testversion", "probeversion", "nur im bundle", "season pass",
+        "stufenpaket", "charakter", "level", "objekt",
+    ],
 
     # Французский
-    "monnaie virtuelle", "crédits", "pièces", "pack", "objet", "tenue",
-    "arme", "armure", "extension", "contenu additionnel", "add-on",
-    "amélioration", "booster", "mise à niveau", "démo", "version d'essai",
-    "season pass", "essai gratuit", "niveau", "élément",
+    "fr": [
+        "monnaie virtuelle", "crédits", "pièces", "pack", "objet", "tenue",
+        "arme", "armure", "extension", "contenu additionnel", "add-on",
+        "amélioration", "booster", "mise à niveau", "démo", "version d'essai",
+        "season pass", "essai gratuit", "niveau", "élément",
+    ],
 
-    "nivel",
+    # Испанский и португальский
+    "es": ["nivel"],
+    "pt": ["nivel"],
 
     # Украинский
-    "віртуальна валюта", "кредити", "монети", "пакет", "набір",
-    "набір предметів", "предмет", "зброя", "доповнення", "додатковий контент",
-    "dlc", "апґрейд", "покращення", "бустер", "розширення",
-    "оновлення", "пробна версія", "демо", "сезонний пропуск", "season pass",
-    "пропуск", "лише в складі набору", "тільки у складі пакета", "контент", "додаток",
-    "тимчасовий доступ", "рівень", "рівня", "рівнів", "набір рівнів",
-    "пакет рівнів", "додатковий рівень", "відкриття рівня", "розблокування рівня", "збільшення рівня",
-    "підвищення рівня", "нові рівні",
-]
+    "uk": [
+        "віртуальна валюта", "кредити", "монети", "пакет", "набір",
+        "набір предметів", "предмет", "зброя", "доповнення", "додатковий контент",
+        "dlc", "апґрейд", "покращення", "бустер", "розширення",
+        "оновлення", "пробна версія", "демо", "сезонний пропуск", "season pass",
+        "пропуск", "лише в складі набору", "тільки у складі пакета", "контент", "додаток",
+        "тимчасовий доступ", "рівень", "рівня", "рівнів", "набір рівнів",
+        "пакет рівнів", "додатковий рівень", "відкриття рівня", "розблокування рівня", "збільшення рівня",
+        "підвищення рівня", "нові рівні",
+    ],
+}
+
+# Все "мусорные" типы без повторов
+TRASH_TYPES = list(dict.fromkeys(t for types in TRASH_TYPES_BY_LANG.values() for t in types))
+
+# Отметки в тексте карточки, при которых она пропускается
+SKIPPED_CARD_MARKERS = ["unavailable", "pre-order", "announced"]
+
+# Слова и фразы издания и платформы, отбрасываемые при сравнении названий
+# (в нормализованном виде: нижний регистр, без пунктуации)
+EDITION_WORDS = {
+    "edition", "deluxe", "digital", "complete", "standard", "ultimate", "gold", "premium",
+    "definitive", "goty", "launch", "special", "bundle", "ps4", "ps5", "and",
+}
+EDITION_PHRASES = ["game of the year", "director s cut", "cross gen"]
+
+# Категории магазина со всеми играми платформы (для режима обхода каталога)
+CATALOG_CATEGORIES = {
+    "ps5": "4cbf39e2-5749-4970-ba81-93a489e4570c",
+    "ps4": "44d8bb20-653e-431e-8ad0-c0a365f68d2f",
+}
+
+# Максимум страниц категории, загружаемых при обходе каталога
+MAX_CATALOG_PAGES = 500
 
 # Доступные регионы
 REGIONS = [
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+from constants import HTTP_CACHE_FILE, HTTP_CACHE_MAX_ENTRIES
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes  # тело ответа, сжатое zlib
+
+    def text(self) -> str:
+        return zlib.decompress(self.body).decode("utf-8")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        # Заголовки условного запроса: сервер ответит 304, если страница не изменилась
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    # Постоянный HTTP-кэш на SQLite под сессией StoreClient:
+    #   responses: URL -> ETag, Last-Modified и сжатое тело последнего ответа 200
+    #   parsed:    (URL, функция разбора с аргументами) -> результат разбора этого тела
+    # При новом теле результаты разбора URL удаляются, поэтому после ответа 304
+    # сохранённый результат разбора соответствует странице и её можно не разбирать заново.
+    # Размер ограничен max_entries страниц, лишние вытесняются по LRU.
+
+    def __init__(self, path: str = HTTP_CACHE_FILE, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, "
+            "updated_at REAL, accessed_at REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS parsed ("
+            "url TEXT, key TEXT, data TEXT, PRIMARY KEY (url, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _evict(self) -> None:
+        # Вытесняет самые давно использованные страницы сверх лимита вместе с их разбором
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+            self.conn.execute("DELETE FROM parsed WHERE url NOT IN (SELECT url FROM responses)")
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        row = self.conn.execute(
+            "SELECT etag, last_modified, body FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str) -> None:
+        # Сохраняет ответ 200 с валидаторами; прежние результаты разбора страницы больше не действительны
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, zlib.compress(text.encode("utf-8")), now, now)
+        )
+        self.conn.execute("DELETE FROM parsed WHERE url = ?", (url,))
+        self._evict()
+        self.conn.commit()
+
+    def touch(self, url: str) -> None:
+        # Отмечает подтверждённую ответом 304 страницу как использованную
+        self.conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+
+    def get_parsed(self, url: str, key: str) -> Optional[Any]:
+        row = self.conn.execute("SELECT data FROM parsed WHERE url = ? AND key = ?", (url, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_parsed(self, url: str, key: str, value: Any) -> None:
+        # Результат разбора сохраняется, только если сама страница есть в кэше
+        self.conn.execute(
+            "INSERT OR REPLACE INTO parsed SELECT url, ?, ? FROM responses WHERE url = ?",
+            (key, json.dumps(value, ensure_ascii=False), url)
+        )
+        self.conn.commit()
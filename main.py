@@ -1,49 +1,141 @@
+import argparse
 import asyncio
+import logging
+import sys
+from typing import List, Optional
 from ps_store_checker import check_multiple_games_languages_md_async
-from constants import REGIONS
-
-async def main():
-    # Игры для PS5
-    ps5_games = [
-        # "God of War Ragnarok",
-        # "Spider-Man: Miles Morales",
-        # "Death Stranding",
-        # "Immortals Fenyx Rising",
-        # "Grand Theft Auto V",
-        "Horizon Zero Dawn",
-        # "Horizon Forbidden West",
-        "Days Gone",
-    ]
-
-    # Игры для PS4
-    ps4_games = [
-        # "Assassins Creed Origins",
-        # "Detroit Become Human",
-        "Days Gone",
-        "Horizon Zero Dawn",
-        # "Horizon Forbidden West",
-    ]
-
-    # Выбранные регионы для проверки
-    selected_regions = ['en-pl', 'en-tr', 'uk-ua']
-
-    # Проверяем игры для PS5
-    await check_multiple_games_languages_md_async(
-        ps5_games, 
-        selected_regions, 
-        "ps5", 
-        "ru", 
-        "ps5_games.md"
-    )
+from cache import ResultCache
+from checkpoint import CheckpointJournal
+from http_cache import HttpCache
+from merge import merge_outputs
+from sharding import Shard
+from snapshot import ResultSnapshot
+from constants import CHECKPOINT_FILE, SNAPSHOT_FILE, REGIONS
+from store_client import StoreClient
+
+logger = logging.getLogger(__name__)
+
+
+def read_list(path: str) -> List[str]:
+    # Список из файла ("-" — stdin): по значению в строке, пустые строки и # комментарии
+    # пропускаются, повторы убираются с сохранением порядка
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    items = (line.split("#", 1)[0].strip() for line in lines)
+    return list(dict.fromkeys(item for item in items if item))
+
+
+def collect_games(args) -> List[str]:
+    games = list(args.games)
+    if args.games_file:
+        games += read_list(args.games_file)
+    return list(dict.fromkeys(games))
+
+
+def collect_regions(args) -> List[str]:
+    regions = list(args.region)
+    if args.regions_file:
+        regions += read_list(args.regions_file)
+    return list(dict.fromkeys(regions)) or list(REGIONS)
+
+
+async def check(args):
+    games = collect_games(args)
+    if not games:
+        raise SystemExit("❌ Не заданы игры: перечислите их или укажите --games-file")
+    regions = collect_regions(args)
+    shard: Optional[Shard] = args.shard
+
+    # У каждого шарда свои отчёт, журнал и снимок; кэши общие
+    output = shard.path(args.output) if shard else args.output
+    checkpoint_file = shard.path(CHECKPOINT_FILE) if shard else CHECKPOINT_FILE
+    snapshot_file = shard.path(SNAPSHOT_FILE) if shard else SNAPSHOT_FILE
+    exports = [shard.path(path) for path in args.export] if shard else args.export
+    diff_file = output.rsplit(".", 1)[0] + "_diff.md" if args.diff else None
+
+    # Постоянный кэш результатов поиска и языков между запусками,
+    # журнал позволяет продолжить прерванный прогон с --resume.
+    # Один клиент (соединения, DNS, ограничитель) используется для всех прогонов;
+    # HTTP-кэш позволяет перепроверять страницы условными запросами без повторной загрузки.
+    # С --diff изменения относительно прошлого прогона пишутся в <отчёт>_diff.md.
+    snapshot = ResultSnapshot(snapshot_file) if args.diff else None
+    with ResultCache() as cache, \
+            CheckpointJournal(checkpoint_file, resume=args.resume) as checkpoint, \
+            HttpCache() as http_cache:
+        async with StoreClient.create(http_cache=http_cache) as client:
+            # Все платформы и языки проверяются за один проход по одним и тем же страницам
+            await check_multiple_games_languages_md_async(
+                games,
+                regions,
+                args.platform or ["ps5", "ps4"],
+                args.lang or ["ru"],
+                output,
+                cache=cache,
+                by_concept=args.by_concept,
+                sort_results=True,
+                checkpoint=checkpoint,
+                client=client,
+                use_catalog=args.catalog,
+                metrics_file=args.metrics,
+                snapshot=snapshot,
+                diff_file=diff_file,
+                extra_outputs=exports,
+                shard=shard
+            )
+
+
+def merge(args):
+    # Объединяет отчёты шардов; с --games-file/--regions-file строки упорядочиваются по спискам
+    games = read_list(args.games_file) if args.games_file else None
+    regions = read_list(args.regions_file) if args.regions_file else None
+    count = merge_outputs(args.inputs, args.output, games, regions)
+    logger.info(f"🧩 {args.output}: {count} строк из {len(args.inputs)} файлов")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Проверка языков игр в PS Store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check_parser = commands.add_parser("check", help="проверить игры по регионам")
+    check_parser.add_argument("games", nargs="*", help="названия игр")
+    check_parser.add_argument("-g", "--games-file", help="файл со списком игр, по одной в строке (- — stdin)")
+    check_parser.add_argument("--region", action="append", default=[], help="регион, например en-pl (можно несколько)")
+    check_parser.add_argument("-r", "--regions-file",
+                              help="файл со списком регионов (- — stdin); по умолчанию все регионы")
+    check_parser.add_argument("--platform", action="append", choices=["ps5", "ps4"],
+                              help="платформа (можно несколько, по умолчанию ps5 и ps4)")
+    check_parser.add_argument("--lang", action="append", help="код языка (можно несколько, по умолчанию ru)")
+    check_parser.add_argument("-o", "--output", default="games.md", help="Markdown-отчёт")
+    check_parser.add_argument("--export", action="append", default=[],
+                              help="дополнительный файл результатов: .csv, .jsonl или .parquet (можно несколько)")
+    check_parser.add_argument("--shard", type=Shard.parse, help="проверить только часть пар: i/N, например 1/4")
+    check_parser.add_argument("--resume", action="store_true", help="продолжить прерванный прогон по журналу")
+    check_parser.add_argument("--diff", action="store_true",
+                              help="режим изменений: отчёт только об изменившихся ячейках")
+    check_parser.add_argument("--by-concept", action="store_true", help="искать игру один раз и идти по концепту")
+    check_parser.add_argument("--catalog", action="store_true", help="разрешать названия по каталогу региона")
+    check_parser.add_argument("--metrics", help="сохранить метрики (.json или текстовый формат Prometheus)")
+
+    merge_parser = commands.add_parser("merge", help="объединить отчёты шардов")
+    merge_parser.add_argument("inputs", nargs="+", help="файлы шардов одного формата (.md, .csv, .jsonl, .parquet)")
+    merge_parser.add_argument("-o", "--output", required=True, help="итоговый файл")
+    merge_parser.add_argument("-g", "--games-file", help="список игр для упорядочивания строк")
+    merge_parser.add_argument("-r", "--regions-file", help="список регионов для упорядочивания строк")
+    return parser
 
-    # Проверяем игры для PS4
-    await check_multiple_games_languages_md_async(
-        ps4_games, 
-        selected_regions, 
-        "ps4", 
-        "ru", 
-        "ps4_games.md"
-    )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args = build_parser().parse_args()
+    if args.games_file == "-" and args.regions_file == "-":
+        raise SystemExit("❌ Из stdin можно читать только один список")
+    if args.command == "check":
+        asyncio.run(check(args))
+    else:
+        merge(args)
@@ -0,0 +1,105 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from output import load_pyarrow
+
+# Строк в начале Markdown-отчёта до строк таблицы: заголовок, пустая строка, шапка, разделитель
+MD_HEADER_LINES = 4
+
+
+def merge_markdown(
+        paths: Sequence[str],
+        output: str,
+        games: Optional[Sequence[str]] = None,
+        regions: Optional[Sequence[str]] = None
+) -> int:
+    # Объединяет Markdown-отчёты шардов в один: заголовок берётся из первого файла,
+    # повторяющиеся пары игра × регион — из последнего. Если переданы games и regions,
+    # строки упорядочиваются игра → регион, иначе остаются в порядке файлов.
+    header: List[str] = []
+    rows: Dict[Tuple[str, str], str] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+        if not header:
+            header = lines[:MD_HEADER_LINES]
+        elif lines[:MD_HEADER_LINES] != header:
+            raise ValueError(f"❌ Отчёт {path} построен для других платформ или языков")
+        for line in lines[MD_HEADER_LINES:]:
+            if line.startswith("| "):
+                cells = line.split(" | ", 2)
+                rows[(cells[0][2:], cells[1])] = line
+
+    ordered = list(rows.items())
+    if games and regions:
+        game_order = {game: i for i, game in enumerate(games)}
+        region_order = {region.split('-')[-1].upper(): i for i, region in enumerate(regions)}
+        ordered.sort(key=lambda item: (
+            game_order.get(item[0][0], len(game_order)), region_order.get(item[0][1], len(region_order))
+        ))
+
+    with open(output, "w", encoding="utf-8") as f:
+        f.writelines(header)
+        f.writelines(line for _, line in ordered)
+    return len(ordered)
+
+
+def merge_jsonl(paths: Sequence[str], output: str) -> int:
+    count = 0
+    with open(output, "w", encoding="utf-8") as out:
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        out.write(line if line.endswith("\n") else line + "\n")
+                        count += 1
+    return count
+
+
+def merge_csv(paths: Sequence[str], output: str) -> int:
+    # Склеивает CSV с одинаковой шапкой, шапка пишется один раз
+    count = 0
+    header = None
+    with open(output, "w", encoding="utf-8", newline="") as out:
+        for path in paths:
+            with open(path, encoding="utf-8", newline="") as f:
+                first = f.readline()
+                if header is None:
+                    header = first
+                    out.write(first)
+                elif first != header:
+                    raise ValueError(f"❌ У {path} другая шапка CSV")
+                for line in f:
+                    out.write(line)
+                    count += 1
+    return count
+
+
+def merge_parquet(paths: Sequence[str], output: str) -> int:
+    pa, pq = load_pyarrow()
+    table = pa.concat_tables(pq.read_table(path) for path in paths)
+    pq.write_table(table, output, compression="zstd")
+    return table.num_rows
+
+
+# Объединение по расширению выходного файла
+MERGERS = {
+    ".csv": merge_csv,
+    ".jsonl": merge_jsonl,
+    ".parquet": merge_parquet,
+}
+
+
+def merge_outputs(
+        paths: Sequence[str],
+        output: str,
+        games: Optional[Sequence[str]] = None,
+        regions: Optional[Sequence[str]] = None
+) -> int:
+    # Объединяет выходные файлы шардов одного формата; возвращает число строк результата
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".md":
+        return merge_markdown(paths, output, games, regions)
+    if extension not in MERGERS:
+        raise ValueError(f"Неизвестный формат результатов: {output}")
+    return MERGERS[extension](paths, output)
@@ -0,0 +1,191 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+def region_from_url(url: str) -> str:
+    # Регион из URL магазина: https://store.playstation.com/en-pl/... → en-pl
+    parts = urlparse(url).path.split("/")
+    return parts[1] if len(parts) > 1 and parts[1] else "-"
+
+
+def stage_from_url(url: str) -> str:
+    # Этап загрузки по типу страницы: search, product, concept, category
+    parts = urlparse(url).path.split("/")
+    return parts[2] if len(parts) > 2 and parts[2] else "other"
+
+
+class StageStats:
+    # Агрегированные длительности одного этапа
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total": round(self.total, 4),
+            "mean": round(self.mean, 4),
+            "min": round(self.min if self.count else 0.0, 4),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    # Метрики прогона: длительности этапов (DNS, соединение, загрузка по типу страницы,
+    # разбор по функции), трафик, ретраи и статусы ответов по регионам.
+    # Память не растёт с числом запросов: хранятся только агрегаты.
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.stages: Dict[str, StageStats] = {}
+        self.region_stages: Dict[Tuple[str, str], StageStats] = {}
+        self.statuses: Dict[Tuple[str, int], int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float, region: Optional[str] = None) -> None:
+        self.stages.setdefault(stage, StageStats()).add(seconds)
+        if region:
+            self.region_stages.setdefault((region, stage), StageStats()).add(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, region: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, region)
+
+    def count_status(self, region: str, status: int) -> None:
+        self.statuses[(region, status)] = self.statuses.get((region, status), 0) + 1
+
+    def add_bytes(self, region: str, size: int) -> None:
+        self.bytes[region] = self.bytes.get(region, 0) + size
+
+    def count_retry(self, name: str) -> None:
+        self.retries[name] = self.retries.get(name, 0) + 1
+
+    def trace_config(self) -> "aiohttp.TraceConfig":
+        # Трассировка aiohttp для времени DNS и установки соединения
+        import aiohttp
+
+        trace = aiohttp.TraceConfig()
+
+        async def dns_start(session, ctx, params):
+            ctx.dns_started = time.perf_counter()
+
+        async def dns_end(session, ctx, params):
+            self.observe("dns", time.perf_counter() - ctx.dns_started)
+
+        async def connect_start(session, ctx, params):
+            ctx.connect_started = time.perf_counter()
+
+        async def connect_end(session, ctx, params):
+            self.observe("connect", time.perf_counter() - ctx.connect_started)
+
+        trace.on_dns_resolvehost_start.append(dns_start)
+        trace.on_dns_resolvehost_end.append(dns_end)
+        trace.on_connection_create_start.append(connect_start)
+        trace.on_connection_create_end.append(connect_end)
+        return trace
+
+    def region_latencies(self) -> Dict[str, float]:
+        # Среднее время загрузки страницы по регионам
+        totals: Dict[str, StageStats] = {}
+        for (region, stage), stats in self.region_stages.items():
+            if stage.startswith("download."):
+                total = totals.setdefault(region, StageStats())
+                total.count += stats.count
+                total.total += stats.total
+        return {region: stats.mean for region, stats in totals.items() if stats.count}
+
+    def to_dict(self) -> Dict[str, Any]:
+        regions: Dict[str, Dict[str, Any]] = {}
+        for (region, stage), stats in self.region_stages.items():
+            regions.setdefault(region, {"stages": {}, "statuses": {}, "bytes": 0})["stages"][stage] = stats.to_dict()
+        for (region, status), count in self.statuses.items():
+            regions.setdefault(region, {"stages": {}, "statuses": {}, "bytes": 0})["statuses"][str(status)] = count
+        for region, size in self.bytes.items():
+            regions.setdefault(region, {"stages": {}, "statuses": {}, "bytes": 0})["bytes"] = size
+
+        return {
+            "elapsed": round(time.monotonic() - self.started_at, 3),
+            "stages": {stage: stats.to_dict() for stage, stats in self.stages.items()},
+            "retries": dict(self.retries),
+            "bytes": sum(self.bytes.values()),
+            "regions": regions,
+        }
+
+    def to_prometheus(self) -> str:
+        # Текстовый формат Prometheus
+        lines = [
+            "# TYPE ps_store_stage_seconds summary",
+        ]
+        for stage, stats in sorted(self.stages.items()):
+            lines.append(f'ps_store_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+            lines.append(f'ps_store_stage_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+        lines.append("# TYPE ps_store_region_stage_seconds summary")
+        for (region, stage), stats in sorted(self.region_stages.items()):
+            labels = f'region="{region}",stage="{stage}"'
+            lines.append(f"ps_store_region_stage_seconds_count{{{labels}}} {stats.count}")
+            lines.append(f"ps_store_region_stage_seconds_sum{{{labels}}} {stats.total:.6f}")
+        lines.append("# TYPE ps_store_responses_total counter")
+        for (region, status), count in sorted(self.statuses.items()):
+            lines.append(f'ps_store_responses_total{{region="{region}",status="{status}"}} {count}')
+        lines.append("# TYPE ps_store_bytes_total counter")
+        for region, size in sorted(self.bytes.items()):
+            lines.append(f'ps_store_bytes_total{{region="{region}"}} {size}')
+        lines.append("# TYPE ps_store_retries_total counter")
+        for name, count in sorted(self.retries.items()):
+            lines.append(f'ps_store_retries_total{{function="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        # Сохраняет метрики: .json — в JSON, иначе в текстовом формате Prometheus
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+    def summary(self) -> str:
+        # Краткая сводка для лога
+        lines = [f"📊 Метрики за {time.monotonic() - self.started_at:.1f}с:"]
+        for stage, stats in sorted(self.stages.items()):
+            lines.append(
+                f"  {stage}: {stats.count} шт., сред. {stats.mean:.3f}с, "
+                f"мин. {stats.min:.3f}с, макс. {stats.max:.3f}с"
+            )
+        lines.append(f"  Трафик: {sum(self.bytes.values()) / 1024 / 1024:.2f} МБ")
+        lines.append(f"  Ретраи: {sum(self.retries.values())}")
+
+        by_region: Dict[str, Dict[int, int]] = {}
+        for (region, status), count in self.statuses.items():
+            by_region.setdefault(region, {})[status] = count
+        for region in sorted(by_region):
+            statuses = ", ".join(f"{status}×{count}" for status, count in sorted(by_region[region].items()))
+            mean = sum(
+                s.total for (r, stage), s in self.region_stages.items() if r == region and stage.startswith("download.")
+            ) / max(1, sum(by_region[region].values()))
+            lines.append(f"  {region}: {statuses}, сред. загрузка {mean:.3f}с")
+        return "\n".join(lines)
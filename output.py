@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from checkpoint import mark_columns
+from constants import STORE_URL, PARQUET_BATCH_SIZE, ERROR_MARK
+
+# Значения отметок таблицы
+MARKS = {"✅": True, "❌": False}
+
+
+@dataclass(slots=True)
+class LanguageRecord:
+    # Результат одной проверки (игра, регион, платформа, язык) в «длинном» формате
+    game: str
+    region: str
+    platform: str
+    lang: str
+    status: str                # "ok", "not_found" или "error"
+    available: Optional[bool]  # игра есть на платформе
+    voice: Optional[bool]
+    subs: Optional[bool]
+    match_title: Optional[str]   # название игры, выбранной поиском
+    match_score: Optional[float] # уверенность совпадения от 0 до 1
+    url: str                   # URL продукта или сообщение об ошибке
+    checked_at: float
+
+
+RECORD_FIELDS = [f.name for f in fields(LanguageRecord)]
+
+
+def load_pyarrow():
+    # Parquet пишется через pyarrow, если он установлен; импортируется только при записи Parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("❌ Для записи Parquet нужен pyarrow (pip install pyarrow)") from None
+    return pyarrow, pyarrow.parquet
+
+
+def records_from_row(
+        game: str,
+        region: str,
+        platform: str,
+        lang_code: str,
+        row: List[str],
+        checked_at: Optional[float] = None
+) -> List[LanguageRecord]:
+    # Раскладывает строку таблицы (build_row_md/error_row_md) на записи по платформам и языкам.
+    # platform и lang_code — ключи вида "ps5+ps4" и "ru+en", как в журнале.
+    # Уверенность совпадения в таблице может быть отмечена ⚠️ — в записи только число
+    checked_at = time.time() if checked_at is None else checked_at
+    if row[2] == ERROR_MARK:
+        status = "error"
+    elif not row[-1].startswith(STORE_URL):
+        status = "not_found"
+    else:
+        status = "ok"
+
+    match_title, match_score = (row[2 + mark_columns(platform, lang_code):-1] + ["", ""])[:2]
+    score = float(match_score.replace("⚠️", "").strip()) if match_score else None
+
+    lang_codes = lang_code.split("+")
+    marks = iter(row[2:-1])
+    records = []
+    for p in platform.split("+"):
+        available = MARKS.get(next(marks, ""))
+        for code in lang_codes:
+            voice, subs = MARKS.get(next(marks, "")), MARKS.get(next(marks, ""))
+            if status != "ok":
+                available = voice = subs = None
+            records.append(LanguageRecord(
+                game, region, p, code, status, available, voice, subs,
+                match_title or None, score, row[-1], checked_at
+            ))
+    return records
+
+
+class ResultWriter(ABC):
+    # Потоковая запись результатов; наследники реализуют write() и close()
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @abstractmethod
+    def write(self, records: Iterable[LanguageRecord]) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class CsvResultWriter(ResultWriter):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(RECORD_FIELDS)
+
+    def write(self, records: Iterable[LanguageRecord]) -> None:
+        self.writer.writerows(
+            ["" if value is None else value for value in (getattr(r, name) for name in RECORD_FIELDS)]
+            for r in records
+        )
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class JsonlResultWriter(ResultWriter):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, records: Iterable[LanguageRecord]) -> None:
+        self.file.writelines(
+            json.dumps({name: getattr(r, name) for name in RECORD_FIELDS}, ensure_ascii=False) + "\n"
+            for r in records
+        )
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    # Записи копятся по колонкам и сбрасываются группами строк по batch_size,
+    # поэтому память ограничена размером группы
+
+    def __init__(self, path: str, batch_size: int = PARQUET_BATCH_SIZE):
+        pa, pq = load_pyarrow()
+        super().__init__(path)
+        self.pa = pa
+        self.batch_size = batch_size
+        self.schema = pa.schema([
+            ("game", pa.string()),
+            ("region", pa.string()),
+            ("platform", pa.string()),
+            ("lang", pa.string()),
+            ("status", pa.string()),
+            ("available", pa.bool_()),
+            ("voice", pa.bool_()),
+            ("subs", pa.bool_()),
+            ("match_title", pa.string()),
+            ("match_score", pa.float64()),
+            ("url", pa.string()),
+            ("checked_at", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.columns: Dict[str, List[Any]] = {name: [] for name in RECORD_FIELDS}
+        self.pending = 0
+
+    def write(self, records: Iterable[LanguageRecord]) -> None:
+        for r in records:
+            for name in RECORD_FIELDS:
+                self.columns[name].append(getattr(r, name))
+            self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        self.writer.write_table(self.pa.Table.from_pydict(self.columns, schema=self.schema))
+        self.columns = {name: [] for name in RECORD_FIELDS}
+        self.pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+# Писатели по расширению файла
+WRITERS = {
+    ".csv": CsvResultWriter,
+    ".jsonl": JsonlResultWriter,
+    ".parquet": ParquetResultWriter,
+}
+
+
+def create_writer(path: str) -> ResultWriter:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Неизвестный формат результатов: {path} (поддерживаются {', '.join(WRITERS)})")
+    return WRITERS[extension](path)
+
+
+def create_writers(paths: Sequence[str]) -> List[ResultWriter]:
+    writers = []
+    try:
+        for path in paths:
+            writers.append(create_writer(path))
+    except Exception:
+        for writer in writers:
+            writer.close()
+        raise
+    return writers
@@ -0,0 +1,367 @@
+import importlib
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from constants import STORE_URL, TRASH_TYPES, TRASH_TYPES_BY_LANG, SKIPPED_CARD_MARKERS
+from title_index import title_similarity
+
+# Быстрый HTML-парсер выбирается по доступности: selectolax → lxml → BeautifulSoup.
+# Выбор и импорт делаются при первом разборе страницы поиска (см. parser_backend()),
+# чтобы импорт модуля оставался лёгким; значение можно задать заранее.
+PARSER_BACKEND: Optional[str] = None
+
+PRODUCT_TYPE_CLASS = "psw-product-tile__product-type"
+PRODUCT_NAME_QA = "product-name"
+
+# Надбавка к оценке карточки, на которой указаны все запрошенные платформы
+ALL_PLATFORMS_BONUS = 0.05
+
+# Ключи языков в результате разбора страницы продукта
+LANGUAGE_KEYS = ('ps5_voice', 'ps5_subs', 'ps4_voice', 'ps4_subs')
+
+# Максимум карточек, которые рассматриваются на странице поиска
+MAX_SEARCH_CARDS = 20
+
+
+def parser_backend() -> str:
+    global PARSER_BACKEND
+    if PARSER_BACKEND is None:
+        try:
+            importlib.import_module("selectolax.lexbor")
+            PARSER_BACKEND = "selectolax"
+        except ImportError:
+            try:
+                importlib.import_module("lxml.html")
+                PARSER_BACKEND = "lxml"
+            except ImportError:
+                PARSER_BACKEND = "bs4"
+    return PARSER_BACKEND
+
+
+def _cards_selectolax(html: str, limit: int) -> List[Dict[str, Any]]:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+
+    cards = []
+    for node in HTMLParser(html).css('a[href*="/product/"]')[:limit]:
+        type_node = node.css_first(f"span.{PRODUCT_TYPE_CLASS}")
+        name_node = node.css_first(f'[data-qa$="{PRODUCT_NAME_QA}"]')
+        cards.append({
+            "href": node.attributes.get("href") or "",
+            "text": node.text(),
+            "type": type_node.text() if type_node else None,
+            "name": name_node.text() if name_node else None,
+        })
+    return cards
+
+
+def _cards_lxml(html: str, limit: int) -> List[Dict[str, Any]]:
+    import lxml.html
+
+    cards = []
+    for node in lxml.html.fromstring(html).xpath('//a[contains(@href, "/product/")]')[:limit]:
+        type_nodes = node.xpath(
+            f'.//span[contains(concat(" ", normalize-space(@class), " "), " {PRODUCT_TYPE_CLASS} ")]'
+        )
+        # В XPath 1.0 нет ends-with, сравниваем хвост атрибута
+        name_nodes = node.xpath(
+            f'.//*[substring(@data-qa, string-length(@data-qa) - {len(PRODUCT_NAME_QA) - 1}) = "{PRODUCT_NAME_QA}"]'
+        )
+        cards.append({
+            "href": node.get("href", ""),
+            "text": node.text_content(),
+            "type": type_nodes[0].text_content() if type_nodes else None,
+            "name": name_nodes[0].text_content() if name_nodes else None,
+        })
+    return cards
+
+
+def _cards_bs4(html: str, limit: int) -> List[Dict[str, Any]]:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # Строим дерево только из ссылок на продукты, остальная страница пропускается
+    strainer = SoupStrainer("a", href=re.compile("/product/"))
+    cards = []
+    for node in BeautifulSoup(html, "html.parser", parse_only=strainer).find_all("a")[:limit]:
+        type_node = node.find("span", class_=PRODUCT_TYPE_CLASS)
+        name_node = node.find(attrs={"data-qa": re.compile(f"{PRODUCT_NAME_QA}$")})
+        cards.append({
+            "href": node.get("href", ""),
+            "text": node.get_text(),
+            "type": type_node.text if type_node else None,
+            "name": name_node.get_text() if name_node else None,
+        })
+    return cards
+
+
+def extract_product_cards(html: str, limit: int = MAX_SEARCH_CARDS) -> List[Dict[str, Any]]:
+    # Достаёт карточки продуктов со страницы поиска: href, текст и тип продукта
+    backend = parser_backend()
+    if backend == "selectolax":
+        return _cards_selectolax(html, limit)
+    if backend == "lxml":
+        return _cards_lxml(html, limit)
+    return _cards_bs4(html, limit)
+
+
+def extract_next_data(html: str) -> Optional[str]:
+    # Находит содержимое <script id="__NEXT_DATA__"> прямым поиском по строке, без построения дерева
+    marker = html.find('id="__NEXT_DATA__"')
+    if marker == -1:
+        return None
+    start = html.find(">", marker)
+    end = html.find("</script>", start)
+    if start == -1 or end == -1:
+        return None
+    return html[start + 1:end]
+
+
+def compile_matcher(words: Sequence[str]) -> re.Pattern:
+    # Собирает подстроки в одно регулярное выражение-альтернацию (без повторов, длинные первыми),
+    # чтобы проверять текст за один проход вместо цикла по списку
+    unique = sorted({w.lower() for w in words}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(w) for w in unique))
+
+
+@lru_cache(maxsize=None)
+def trash_matcher(locale: Optional[str] = None) -> re.Pattern:
+    # Матчер "мусорных" типов для языка магазина (префикс региона, например "uk" для uk-ua):
+    # английские типы плюс типы этого языка. Для языков без своего списка — все типы.
+    if locale and locale in TRASH_TYPES_BY_LANG:
+        return compile_matcher(TRASH_TYPES_BY_LANG["en"] + TRASH_TYPES_BY_LANG[locale])
+    return compile_matcher(TRASH_TYPES)
+
+
+SKIPPED_CARD_MATCHER = compile_matcher(SKIPPED_CARD_MARKERS)
+
+
+def is_card_game(card: Dict[str, Any], locale: Optional[str] = None) -> bool:
+    # Проверяет, является ли карточка товара игрой (не DLC, валюта и т.д.).
+    if not card.get("type"):
+        return True  # Нет типа — скорее всего, игра
+    # Тип явно мусорный → отбрасываем, иначе оставляем
+    return trash_matcher(locale).search(card["type"].strip().lower()) is None
+
+
+def card_title(card: Dict[str, Any]) -> str:
+    # Название игры на карточке; если отдельного элемента нет — текст без платформ и типа
+    if card.get("name"):
+        return card["name"].strip()
+    text = card["text"]
+    if card.get("type"):
+        text = text.replace(card["type"], " ")
+    return re.sub(r"^\s*(?:ps[45]\s*)+", "", text, flags=re.IGNORECASE).strip()
+
+
+def pick_game_match(
+        html: str,
+        platform: Union[str, Sequence[str]],
+        query: Optional[str] = None,
+        locale: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    # Выбирает игру для платформы среди карточек страницы поиска и возвращает
+    # {"url", "title", "score"}. Если задан query, карточки ранжируются по похожести
+    # названия (score — уверенность от 0 до 1), иначе берётся первая подходящая (score = None).
+    # Для нескольких платформ предпочитается карточка, где указаны все.
+    # locale — язык магазина, по нему выбирается набор "мусорных" типов.
+    platforms = [platform.lower()] if isinstance(platform, str) else [p.lower() for p in platform]
+    candidates = []
+
+    for card in extract_product_cards(html):
+        full_url = STORE_URL + card["href"]
+        lowered = card["text"].lower()
+
+        if SKIPPED_CARD_MATCHER.search(lowered):
+            continue
+
+        if not lowered.strip().startswith(("ps5", "ps4")):
+            continue
+
+        if not is_card_game(card, locale):
+            continue
+
+        # Карточка должна быть хотя бы для одной из платформ
+        if not any(p in lowered for p in platforms):
+            continue
+
+        covers_all = all(p in lowered for p in platforms)
+        candidates.append((card_title(card), full_url, covers_all))
+
+    if not candidates:
+        return None
+
+    if query is None:
+        title, url, _ = next((c for c in candidates if c[2]), candidates[0])
+        return {"url": url, "title": title, "score": None}
+
+    best = None
+    for title, url, covers_all in candidates:
+        score = title_similarity(query, title)
+        rank = score + (ALL_PLATFORMS_BONUS if covers_all else 0.0)
+        if best is None or rank > best[0]:
+            best = (rank, {"url": url, "title": title, "score": score})
+    return best[1]
+
+
+# Типы элементов с языками: поле со списком языков и суффикс ключа результата
+LANGUAGE_ELEMENTS = {
+    "SpokenLanguagesByPlatformElement": ("spokenLanguages", "voice"),
+    "ScreenLanguagesByPlatformElement": ("screenLanguages", "subs"),
+}
+
+
+def _empty_product_info() -> Dict[str, Any]:
+    return {
+        'ps5_voice': [],
+        'ps5_subs': [],
+        'ps4_voice': [],
+        'ps4_subs': [],
+        'product_id': None,
+        'concept_id': None,
+        'title': None,
+        'release_date': None,
+        'price': None,
+    }
+
+
+def _ref_id(value: Any) -> Optional[str]:
+    # Достаёт ID из ссылки Apollo ({"__ref": "Concept:123"}) или вложенного объекта ({"id": "123"})
+    if not isinstance(value, dict):
+        return None
+    if value.get("__ref"):
+        return str(value["__ref"]).split(":", 1)[-1]
+    if value.get("id"):
+        return str(value["id"])
+    return None
+
+
+def _iter_embedded_json(text: str):
+    # Достаёт JSON, вложенный в строку: Apollo-кэш в виде строки или <script> внутри HTML-фрагмента
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            yield json.loads(stripped)
+            return
+        except ValueError:
+            pass
+
+    decoder = json.JSONDecoder()
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find("{", pos + 1)
+            continue
+        yield obj
+        pos = text.find("{", end)
+
+
+def collect_products(data: Any) -> Dict[Optional[str], Dict[str, Any]]:
+    # Обходит JSON страницы за один проход и собирает данные по каждому продукту.
+    # Элементы языков относятся к ближайшему объемлющему Product; найденные вне продуктов
+    # попадают под ключ None.
+    products: Dict[Optional[str], Dict[str, Any]] = {}
+    stack = [(data, None)]
+
+    while stack:
+        node, owner = stack.pop()
+
+        if isinstance(node, dict):
+            typename = node.get("__typename")
+            if typename == "Product" and node.get("id"):
+                owner = str(node["id"])
+                info = products.setdefault(owner, _empty_product_info())
+                info['product_id'] = owner
+                info['title'] = info['title'] or node.get("name")
+                info['release_date'] = info['release_date'] or node.get("releaseDate")
+                info['concept_id'] = info['concept_id'] or _ref_id(node.get("concept"))
+                price = node.get("price")
+                if isinstance(price, dict) and not info['price']:
+                    info['price'] = price.get("discountedPrice") or price.get("basePrice")
+            elif typename in LANGUAGE_ELEMENTS:
+                field, prefix = LANGUAGE_ELEMENTS[typename]
+                platform = str(node.get("platform", "")).lower()
+                if platform in ("ps4", "ps5"):
+                    info = products.setdefault(owner, _empty_product_info())
+                    info[f"{platform}_{prefix}"] = node.get(field) or []
+            children = list(node.values())
+        elif isinstance(node, list):
+            children = node
+        elif isinstance(node, str) and "__typename" in node:
+            children = list(_iter_embedded_json(node))
+        else:
+            continue
+
+        # Кладём в обратном порядке, чтобы обходить узлы в порядке документа
+        stack.extend((child, owner) for child in reversed(children))
+
+    return products
+
+
+def iter_json_dicts(data: Any):
+    # Обходит JSON (включая вложенный в строки) и выдаёт все объекты в порядке документа
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            children = list(node.values())
+        elif isinstance(node, list):
+            children = node
+        elif isinstance(node, str) and "__typename" in node:
+            children = list(_iter_embedded_json(node))
+        else:
+            continue
+        stack.extend(reversed(children))
+
+
+def parse_catalog_page(html: str) -> Dict[str, Any]:
+    # Разбирает страницу категории магазина: список продуктов (ID, название, платформы,
+    # классификация) и число страниц категории
+    script = extract_next_data(html)
+    if script is None:
+        raise Exception("❌ JSON-блок __NEXT_DATA__ не найден")
+
+    products = {}
+    pages = 1
+    for node in iter_json_dicts(json.loads(script)):
+        typename = node.get("__typename")
+        if typename == "Product" and node.get("id") and node.get("name"):
+            products.setdefault(str(node["id"]), {
+                "id": str(node["id"]),
+                "name": node["name"],
+                "platforms": [str(p).lower() for p in node.get("platforms") or []],
+                "classification": node.get("storeDisplayClassification"),
+            })
+        elif typename == "PageInfo" and node.get("size"):
+            pages = max(pages, -(-int(node.get("totalCount") or 0) // int(node["size"])))
+
+    return {"products": list(products.values()), "pages": pages}
+
+
+def parse_product_page(html: str) -> Dict[str, Any]:
+    # Разбирает страницу продукта или концепта: языки озвучки и субтитров по платформам,
+    # а также ID продукта и концепта, название, дату выхода и цену
+    script = extract_next_data(html)
+    if script is None:
+        raise Exception("❌ JSON-блок __NEXT_DATA__ не найден")
+
+    data = json.loads(script)
+    products = collect_products(data)
+    query = data.get("query") or {}
+
+    # Основной продукт страницы — указанный в query, иначе первый с языками
+    result = products.get(query.get("productId"))
+    if result is None:
+        result = next(
+            (info for info in products.values() if any(info[k] for k in LANGUAGE_KEYS)),
+            products.get(None) or _empty_product_info()
+        )
+
+    if not result['concept_id']:
+        result['concept_id'] = query.get("conceptId") or next(
+            (info['concept_id'] for info in products.values() if info['concept_id']), None
+        )
+    return result
@@ -1,383 +1,727 @@
 import asyncio
-import json
 import logging
-import re
 import time
-from typing import List, Dict, Optional, Any
-
-import aiohttp
-import requests
-from bs4 import BeautifulSoup
+from contextlib import ExitStack
+from typing import List, Dict, Optional, Any, Sequence, Union
 
+from cache import ResultCache
+from catalog import CatalogIndex, CatalogLoader, GAME_CLASSIFICATIONS
+from checkpoint import CheckpointJournal, is_completed_row
 from constants import (
-    get_random_headers, HEADERS, REQUEST_TIMEOUT, RETRY_ATTEMPTS, RETRY_DELAY,
-    TRASH_TYPES, MAX_PARALLEL_REQUESTS
-)
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    RETRY_ATTEMPTS, RETRY_DELAY,
+    MAX_PARALLEL_REQUESTS, MAX_CONCURRENCY, RATE_LIMIT_PER_SECOND, PARSE_WORKERS,
+    CATALOG_CATEGORIES, MAX_CATALOG_PAGES, STORE_URL, ERROR_MARK
 )
+from output import create_writers, records_from_row
+from parsers import LANGUAGE_KEYS, parse_catalog_page, parse_product_page, pick_game_match
+from rate_limiter import backoff_delay
+from scheduler import schedule_pairs
+from sharding import Shard
+from snapshot import CellChange, ResultSnapshot
+from store_client import StoreClient
+from title_index import MIN_MATCH_SCORE
+
+# Логирование настраивает вызывающий код (см. main.py); при импорте модуль его не трогает
 logger = logging.getLogger(__name__)
 
-async def retry_request_async(func, *args, retries=RETRY_ATTEMPTS, delay=RETRY_DELAY, fallback=None):
+# Результат поиска, если все попытки запроса завершились ошибкой; None — игра не найдена
+SEARCH_FAILED = "search_failed"
+
+async def retry_request_async(func, *args, retries=RETRY_ATTEMPTS, delay=RETRY_DELAY, fallback=None, metrics=None):
     # Асинхронная версия функции повторных попыток с экспоненциальной задержкой
     for attempt in range(1, retries + 1):
         try:
             return await func(*args)
         except Exception as e:
             if attempt < retries:
-                logger.warning(f"⚠️ Ошибка: {e}. Ретрай через {delay}с... (попытка {attempt}/{retries})")
-                await asyncio.sleep(delay)
+                if metrics:
+                    metrics.count_retry(func.__name__)
+                wait = backoff_delay(attempt, delay, getattr(e, "retry_after", None))
+                logger.warning(f"⚠️ Ошибка: {e}. Ретрай через {wait:.1f}с... (попытка {attempt}/{retries})")
+                await asyncio.sleep(wait)
             else:
                 logger.error(f"❌ Ошибка: {e}. Пропускаем (после {retries} попыток)")
                 return fallback
     return None
 
 
-def is_card_game(card):
-    # Проверяет, является ли карточка товара игрой (не DLC, валюта и т.д.).
-    # Находим product-type, если есть
-    tag = card.find("span", class_="psw-product-tile__product-type")
-    if not tag:
-        return True  # Нет типа — скорее всего, игра
-    type_text = tag.text.strip().lower()
+async def search_game_async(
+        client: StoreClient,
+        region: str,
+        query: str,
+        platform: Union[str, Sequence[str]]
+) -> Optional[Dict[str, Any]]:
+    # Асинхронная версия поиска игры в PS Store: выбранное совпадение {"url", "title", "score"}
+    url = f"{STORE_URL}/{region}/search/{query.lower().replace(' ', '%20').replace('-', '%20')}"
+    logger.info(f"🔍 Поиск игры: {url}")
 
-    for trash in TRASH_TYPES:
-        if trash in type_text:
-            return False  # Тип явно мусорный
-    return True  # Тип есть, но он не мусорный → оставляем
+    platforms = tuple(p.lower() for p in as_list(platform))
+    match = await client.fetch_parsed(url, pick_game_match, platforms, query, region.split('-')[0])
+    if not match:
+        return None
 
+    if match['score'] < MIN_MATCH_SCORE:
+        logger.warning(f"⚠️ Сомнительное совпадение для «{query}» ({region}): {match['title']} ({match['score']:.2f})")
+    else:
+        logger.info(f"🎯 «{query}» ({region}): {match['title']} ({match['score']:.2f})")
+    return match
 
-async def search_game_async(session: aiohttp.ClientSession, region: str, query: str, platform: str) -> Optional[str]:
-    # Асинхронная версия поиска игры в PS Store
-    url = f"https://store.playstation.com/{region}/search/{query.lower().replace(' ', '%20').replace('-', '%20')}"
-    logger.info(f"🔍 Поиск игры: {url}")
 
-    headers = get_random_headers()
-    async with session.get(url, headers=headers, timeout=REQUEST_TIMEOUT) as resp:
-        text = await resp.text()
-        soup = BeautifulSoup(text, "html.parser")
+async def get_languages_async(client: StoreClient, game_url: str) -> Dict[str, Any]:
+    # Асинхронная версия получения языков игры
+    return await client.fetch_parsed(game_url, parse_product_page)
 
-        # Получаем максимум 20 карточек
-        product_cards = soup.select('a[href*="/product/"]')[:20]
-        candidates = []
 
-        for a_tag in product_cards:
-            href = a_tag.get("href", "")
-            full_url = "https://store.playstation.com" + href
-            text = a_tag.get_text()
+def catalog_url(region: str, category_id: str, page: int) -> str:
+    # Формирует URL страницы категории магазина
+    return f"{STORE_URL}/{region}/category/{category_id}/{page}"
 
-            if "unavailable" in text.lower() or "pre-order" in text.lower() or "announced" in text.lower():
-                continue
 
-            if not text.lower().strip().startswith("ps5") and not text.lower().strip().startswith("ps4"):
-                continue
+async def crawl_catalog_async(client: StoreClient, region: str, platform: Union[str, Sequence[str]]) -> CatalogIndex:
+    # Обходит категории игр региона для нужных платформ и строит индекс название → URL
+    index = CatalogIndex()
+    for p in as_list(platform):
+        category_id = CATALOG_CATEGORIES.get(p.lower())
+        if not category_id:
+            continue
 
-            if not is_card_game(a_tag):
-                continue
+        first = await retry_request_async(
+            client.fetch_parsed, catalog_url(region, category_id, 1), parse_catalog_page, metrics=client.metrics
+        )
+        if not first:
+            continue
+        pages = min(first['pages'], MAX_CATALOG_PAGES)
+        logger.info(f"📚 Каталог {region} ({p.upper()}): {pages} стр.")
 
-            candidates.append((text, full_url))
+        rest = await asyncio.gather(*(
+            retry_request_async(
+                client.fetch_parsed, catalog_url(region, category_id, n), parse_catalog_page, metrics=client.metrics
+            )
+            for n in range(2, pages + 1)
+        ))
+        for page in [first, *rest]:
+            for product in (page or {}).get('products', []):
+                if product['classification'] not in GAME_CLASSIFICATIONS:
+                    continue
+                url = f"{STORE_URL}/{region}/product/{product['id']}"
+                index.add(product['name'], url, product['platforms'] or [p.lower()])
 
-        # Ищем карточку с упоминанием и ps4/ps5
-        for text, url in candidates:
-            if platform.lower() in text.lower():
-                return url
+    logger.info(f"📚 Каталог {region}: {len(index)} названий")
+    return index
 
-        return None
 
+def yesno_md(x):
+    # Конвертирует булево значение в markdown-галочку.
+    return "✅" if x else "❌"
 
-async def get_languages_async(session: aiohttp.ClientSession, game_url: str) -> Dict[str, List[str]]:
-    # Асинхронная версия получения языков игры
-    headers = get_random_headers()
-    async with session.get(game_url, headers=headers, timeout=REQUEST_TIMEOUT) as resp:
-        text = await resp.text()
-        soup = BeautifulSoup(text, "html.parser")
 
-        script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
-        if not script_tag:
-            raise Exception("❌ JSON-блок __NEXT_DATA__ не найден")
+def concept_url(region: str, concept_id: str) -> str:
+    # Формирует URL страницы концепта игры для региона
+    return f"{STORE_URL}/{region}/concept/{concept_id}"
 
-        text = script_tag.string.replace('\\"', '"')
 
-        # Найдём ВСЕ вложенные JSON-строки, содержащие нужные типы
-        voice_jsons = re.findall(r'\{[^{}]*"__typename":"SpokenLanguagesByPlatformElement"[^{}]*\}', text)
-        sub_jsons = re.findall(r'\{[^{}]*"__typename":"ScreenLanguagesByPlatformElement"[^{}]*\}', text)
+def as_list(value: Union[str, Sequence[str]]) -> List[str]:
+    # Приводит платформу/язык или их список к списку
+    return [value] if isinstance(value, str) else list(value)
 
-        result = {
-            'ps5_voice': [],
-            'ps5_subs': [],
-            'ps4_voice': [],
-            'ps4_subs': [],
-        }
 
-        def parse_json_block(raw, field, prefix):
-            try:
-                data = json.loads(raw)
-                platform = data.get("platform", "").lower()
-                if platform in ["ps4", "ps5"]:
-                    result[f"{platform}_{prefix}"] = data.get(field, [])
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка при парсинге блока: {e}")
+def platform_key(platform: Union[str, Sequence[str]]) -> str:
+    # Ключ набора платформ для кэша и журнала: "ps5", "ps5+ps4"
+    return "+".join(as_list(platform)).lower()
 
-        for j in voice_jsons:
-            parse_json_block(j, "spokenLanguages", "voice")
 
-        for j in sub_jsons:
-            parse_json_block(j, "screenLanguages", "subs")
+def table_header_md(platform: Union[str, Sequence[str]], lang_code: Union[str, Sequence[str]]):
+    # Заголовок отчёта и шапка таблицы: для каждой платформы колонка наличия
+    # и пары колонок озвучки/субтитров по каждому языку
+    lang_codes = as_list(lang_code)
+    header = f"### 🎮 Проверка языков для игр (язык: {', '.join(lang_codes)})\n\n"
+    columns = [("Игра", "------"), ("Регион", "--------")]
+    for p in as_list(platform):
+        columns.append((p.upper(), "-----"))
+        for code in lang_codes:
+            suffix = f" {code}" if len(lang_codes) > 1 else ""
+            columns += [(f"Озв.{suffix}", "------"), (f"Суб.{suffix}", "------")]
+    columns += [("Совпадение", "------------"), ("Увер.", "-------"), ("URL", "-----")]
+    table_header = (
+        f"| {' | '.join(title for title, _ in columns)} |\n"
+        f"|{'|'.join(sep for _, sep in columns)}|\n"
+    )
+    return header, table_header
 
-        return result
 
+def match_cells_md(match: Optional[Dict[str, Any]]) -> List[str]:
+    # Колонки совпадения: название найденной игры и уверенность; сомнительные отмечены ⚠️
+    if not match:
+        return ["", ""]
+    score = match.get('score')
+    if score is None:
+        return [match['title'] or "", ""]
+    return [match['title'] or "", f"{'⚠️ ' if score < MIN_MATCH_SCORE else ''}{score:.2f}"]
 
-def yesno_md(x):
-    # Конвертирует булево значение в markdown-галочку.
-    return "✅" if x else "❌"
+
+def build_row_md(
+        game_query: str,
+        region: str,
+        platform: Union[str, Sequence[str]],
+        lang_code: Union[str, Sequence[str]],
+        url: str,
+        langs: Dict[str, Any],
+        match: Optional[Dict[str, Any]] = None
+):
+    # Формирует строку таблицы по словарю языков; match — совпадение поиска, по которому найдена игра
+    row = [game_query, region.split('-')[-1].upper()]
+    for p in as_list(platform):
+        p = p.lower()
+        if p not in ("ps4", "ps5"):
+            return None
+        row.append(yesno_md(langs[f'{p}_voice'] or langs[f'{p}_subs']))
+        for code in as_list(lang_code):
+            row.append(yesno_md(code in langs[f'{p}_voice']))
+            row.append(yesno_md(code in langs[f'{p}_subs']))
+    row += match_cells_md(match)
+    row.append(url)
+    return row
+
+
+def error_row_md(
+        game_query: str,
+        region: str,
+        platform: Union[str, Sequence[str]],
+        lang_code: Union[str, Sequence[str]],
+        mark: str,
+        message: str
+) -> List[str]:
+    # Строка таблицы для ненайденной игры или ошибки: отметка во всех колонках, сообщение вместо URL
+    columns = len(as_list(platform)) * (1 + 2 * len(as_list(lang_code)))
+    return [game_query, region.split('-')[-1].upper()] + [mark] * columns + match_cells_md(None) + [message]
+
+
+def diff_table_md(changes: List[CellChange]) -> str:
+    # Отчёт режима изменений: только ячейки, изменившиеся с прошлого прогона
+    lines = [
+        "### 🔔 Изменения с прошлого прогона\n\n",
+        "| Игра | Регион | Платформа | Колонка | Было | Стало | URL |\n",
+        "|------|--------|-----------|---------|------|-------|-----|\n",
+    ]
+    lines += [
+        f"| {c.game} | {c.region} | {c.platform.upper()} | {c.column} | {c.before} | {c.after} | {c.url} |\n"
+        for c in changes
+    ]
+    return "".join(lines)
+
+
+def release_date_of(client: StoreClient, cache: Optional[ResultCache], url: str) -> Optional[str]:
+    # Дата выхода по первому URL строки: из результатов разбора клиента или из кэша
+    first = url.split()[0] if url else ""
+    if not first.startswith(STORE_URL):
+        return None
+    langs = client.peek_parsed(first, parse_product_page) or (cache.get_languages(first) if cache else None)
+    return langs.get('release_date') if langs else None
+
+
+def has_language_data(langs: Optional[Dict[str, Any]]) -> bool:
+    # Проверяет, что на странице нашлись хоть какие-то языки
+    return bool(langs) and any(langs[k] for k in LANGUAGE_KEYS)
+
+
+async def find_game_match_async(
+        client: StoreClient,
+        region: str,
+        game_query: str,
+        platform: Union[str, Sequence[str]],
+        cache: Optional[ResultCache] = None,
+        catalog: Optional[CatalogLoader] = None
+) -> Union[Dict[str, Any], str, None]:
+    # Поиск продукта с учётом кэша: совпадение {"url", "title", "score"}; если задан каталог
+    # региона, игра сначала ищется в нём и только при промахе — через поиск магазина.
+    # None — игра не найдена, SEARCH_FAILED — поиск не удался (ошибки сети, исчерпаны повторы).
+    # «Не найдено» тоже кэшируется (пустой URL), чтобы не повторять поиск в каждом прогоне
+    match = cache.get_search(region, game_query, platform_key(platform)) if cache else None
+    if match is None and catalog:
+        match = (await catalog()).find(game_query, platform)
+        if match and cache:
+            cache.set_search(region, game_query, platform_key(platform), match['url'], match['title'], match['score'])
+    if match is None:
+        match = await retry_request_async(
+            search_game_async,
+            client,
+            region,
+            game_query,
+            platform,
+            fallback=SEARCH_FAILED,
+            metrics=client.metrics
+        )
+        if match != SEARCH_FAILED and cache:
+            if match:
+                cache.set_search(region, game_query, platform_key(platform), match['url'], match['title'], match['score'])
+            else:
+                cache.set_search(region, game_query, platform_key(platform), "")
+    if match == SEARCH_FAILED:
+        return match
+    return match if match and match['url'] else None
+
+
+async def fetch_languages_async(
+        client: StoreClient,
+        url: str,
+        cache: Optional[ResultCache] = None
+) -> Optional[Dict[str, Any]]:
+    # Получение языков продукта с учётом кэша
+    langs = cache.get_languages(url) if cache else None
+    if not langs:
+        langs = await retry_request_async(get_languages_async, client, url, metrics=client.metrics)
+        if langs and cache:
+            cache.set_languages(url, langs)
+    return langs
+
+
+async def fill_missing_platforms_async(
+        client: StoreClient,
+        region: str,
+        game_query: str,
+        platform: Union[str, Sequence[str]],
+        url: str,
+        langs: Dict[str, Any],
+        cache: Optional[ResultCache] = None,
+        catalog: Optional[CatalogLoader] = None
+):
+    # Если на найденной странице нет данных по части запрошенных платформ
+    # (отдельные продукты для PS4 и PS5), ищем продукт для каждой такой платформы
+    # (сначала в каталоге региона, если он задан). Дополнительные запросы делаются только в этом случае.
+    # Возвращает None, если дополнительный поиск или загрузка не удались: иначе
+    # сбой сети выглядел бы как отсутствие игры на платформе.
+    platforms = [p.lower() for p in as_list(platform)]
+    if len(platforms) < 2:
+        return url, langs
+
+    urls = [url]
+    langs = dict(langs)
+    for p in platforms:
+        if langs[f'{p}_voice'] or langs[f'{p}_subs']:
+            continue
+        other_match = await find_game_match_async(client, region, game_query, p, cache, catalog)
+        if other_match == SEARCH_FAILED:
+            return None
+        if not other_match or other_match['url'] in urls:
+            continue
+        other_url = other_match['url']
+        other = await fetch_languages_async(client, other_url, cache)
+        if not other:
+            return None
+        if other[f'{p}_voice'] or other[f'{p}_subs']:
+            langs[f'{p}_voice'] = other[f'{p}_voice']
+            langs[f'{p}_subs'] = other[f'{p}_subs']
+            urls.append(other_url)
+    return " ".join(urls), langs
+
+
+async def build_filled_row_md_async(
+        client: StoreClient,
+        game_query: str,
+        region: str,
+        platform: Union[str, Sequence[str]],
+        lang_code: Union[str, Sequence[str]],
+        url: str,
+        langs: Dict[str, Any],
+        match: Optional[Dict[str, Any]],
+        cache: Optional[ResultCache] = None,
+        catalog: Optional[CatalogLoader] = None
+) -> Optional[List[str]]:
+    # Строка таблицы после дозапроса недостающих платформ; при сбое дозапроса — строка ошибки
+    filled = await fill_missing_platforms_async(client, region, game_query, platform, url, langs, cache, catalog)
+    if filled is None:
+        return error_row_md(game_query, region, platform, lang_code, ERROR_MARK, "Не удалось проверить все платформы")
+    return build_row_md(game_query, region, platform, lang_code, *filled, match)
 
 
 async def check_single_game_language_for_region_md_async(
-        session: aiohttp.ClientSession,
+        client: StoreClient,
         game_query: str,
         region: str,
-        platform: str = 'ps5',
-        lang_code: str = 'ru'
+        platform: Union[str, Sequence[str]] = 'ps5',
+        lang_code: Union[str, Sequence[str]] = 'ru',
+        cache: Optional[ResultCache] = None,
+        catalog: Optional[CatalogLoader] = None
 ) -> None | list[str] | list[str | None | Any]:
-    # Асинхронная версия проверки языка для одной игры в одном регионе
-    url = await retry_request_async(
-        search_game_async,
-        session,
-        region,
-        game_query,
-        platform
+    # Асинхронная версия проверки языка для одной игры в одном регионе.
+    # platform и lang_code могут быть списками: все платформы и языки проверяются
+    # по одной и той же загруженной странице.
+    match = await find_game_match_async(client, region, game_query, platform, cache, catalog)
+    if match == SEARCH_FAILED:
+        return error_row_md(game_query, region, platform, lang_code, ERROR_MARK, "Ошибка поиска")
+    if not match:
+        return error_row_md(game_query, region, platform, lang_code, "❌", "Игра не найдена")
+
+    langs = await fetch_languages_async(client, match['url'], cache)
+    if not langs:
+        return error_row_md(game_query, region, platform, lang_code, ERROR_MARK, "Не удалось получить языки")
+
+    return await build_filled_row_md_async(
+        client, game_query, region, platform, lang_code, match['url'], langs, match, cache, catalog
     )
 
-    if not url:
-        return [game_query, region.split('-')[-1].upper()] + ["❌"] * 6 + ["Игра не найдена или ошибка запроса"]
 
-    langs = await retry_request_async(get_languages_async, session, url)
-    if not langs:
-        return [game_query, region.split('-')[-1].upper()] + ["Ошибка"] * 6 + ["Не удалось получить языки"]
+async def resolve_concept_async(
+        client: StoreClient,
+        game_query: str,
+        regions: List[str],
+        platform: Union[str, Sequence[str]] = 'ps5',
+        cache: Optional[ResultCache] = None
+) -> Optional[Dict[str, Any]]:
+    # Находит игру в первом подходящем регионе и возвращает её concept ID
+    # вместе с уже полученными URL и языками, чтобы не запрашивать их повторно
+    for region in regions:
+        match = await find_game_match_async(client, region, game_query, platform, cache)
+        if not match or match == SEARCH_FAILED:
+            continue
+        langs = await fetch_languages_async(client, match['url'], cache)
+        if langs and langs.get('concept_id'):
+            logger.info(f"🔗 {game_query}: concept ID {langs['concept_id']} (регион {region})")
+            return {
+                'region': region, 'url': match['url'], 'langs': langs,
+                'concept_id': langs['concept_id'], 'match': match
+            }
+    return None
 
-    has_ps5 = bool(langs['ps5_voice'] or langs['ps5_subs'])
-    has_ps4 = bool(langs['ps4_voice'] or langs['ps4_subs'])
 
-    if platform.lower() == "ps5":
-        return [
-            game_query,
-            region.split('-')[-1].upper(),
-            yesno_md(has_ps5),
-            yesno_md(lang_code in langs['ps5_voice']),
-            yesno_md(lang_code in langs['ps5_subs']),
-            url
-        ]
-    if platform.lower() == "ps4":
-        return [
-            game_query,
-            region.split('-')[-1].upper(),
-            yesno_md(has_ps4),
-            yesno_md(lang_code in langs['ps4_voice']),
-            yesno_md(lang_code in langs['ps4_subs']),
-            url
-        ]
-    return None
+async def check_single_game_language_by_concept_md_async(
+        client: StoreClient,
+        game_query: str,
+        region: str,
+        concept: Optional[Dict[str, Any]],
+        platform: Union[str, Sequence[str]] = 'ps5',
+        lang_code: Union[str, Sequence[str]] = 'ru',
+        cache: Optional[ResultCache] = None
+) -> None | list[str] | list[str | None | Any]:
+    # Проверка языка по странице концепта без поиска в регионе.
+    # Если концепт не найден или в регионе на его странице нет языков, откатываемся на обычный поиск.
+    if not concept:
+        return await check_single_game_language_for_region_md_async(
+            client, game_query, region, platform, lang_code, cache
+        )
+
+    if region == concept['region']:
+        url, langs = concept['url'], concept['langs']
+    else:
+        url = concept_url(region, concept['concept_id'])
+        langs = await fetch_languages_async(client, url, cache)
+        if not has_language_data(langs):
+            return await check_single_game_language_for_region_md_async(
+                client, game_query, region, platform, lang_code, cache
+            )
+
+    # Игра определена поиском в регионе концепта, поэтому и совпадение берётся оттуда
+    return await build_filled_row_md_async(
+        client, game_query, region, platform, lang_code, url, langs, concept['match'], cache
+    )
 
 
 async def check_multiple_games_languages_md_async(
         games: List[str],
         regions: List[str],
-        platform: str = 'ps5',
-        lang_code: str = 'ru',
+        platform: Union[str, Sequence[str]] = 'ps5',
+        lang_code: Union[str, Sequence[str]] = 'ru',
         output_file: str = 'output.md',
-        max_parallel_requests: int = MAX_PARALLEL_REQUESTS
+        max_parallel_requests: int = MAX_PARALLEL_REQUESTS,
+        max_concurrency: int = MAX_CONCURRENCY,
+        rate_limit: float = RATE_LIMIT_PER_SECOND,
+        cache: Optional[ResultCache] = None,
+        by_concept: bool = False,
+        sort_results: bool = False,
+        checkpoint: Optional[CheckpointJournal] = None,
+        parse_workers: int = PARSE_WORKERS,
+        client: Optional[StoreClient] = None,
+        use_catalog: bool = False,
+        metrics_file: Optional[str] = None,
+        snapshot: Optional[ResultSnapshot] = None,
+        diff_file: Optional[str] = None,
+        extra_outputs: Sequence[str] = (),
+        shard: Optional[Shard] = None,
+        schedule: bool = True
 ) -> None:
-    # Асинхронная версия проверки языков для нескольких игр
-    header = f"### 🎮 Проверка языков для игр (язык: {lang_code})\n\n"
-    table_header = (
-        f"| Игра | Регион | {platform.upper()} | Озв. | Суб. | URL |\n"
-        "|------|--------|-----|------|------|-----|\n"
-    )
-
-    # Создаем файл и записываем заголовки
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(header)
-        f.write(table_header)
+    # Асинхронная версия проверки языков для нескольких игр.
+    # platform и lang_code могут быть списками: тогда в одной таблице для каждой платформы
+    # и каждого языка есть свои колонки, а страница игры загружается один раз.
+    # Строки пишутся в файл сразу по готовности; sort_results=True в конце
+    # переписывает таблицу в порядке игра → регион.
+    # checkpoint: пары, уже записанные в журнал, не перепроверяются, а итоговая
+    # таблица в конце собирается из журнала.
+    # by_concept=True: concept ID игры определяется один раз, а в остальных регионах
+    # сразу запрашивается страница концепта без поиска.
+    # parse_workers > 0: разбор HTML выполняется в пуле из стольких процессов.
+    # Параллельность запросов начинается с max_parallel_requests и подстраивается
+    # под ответы сервера в пределах max_concurrency, частота ограничена rate_limit.
+    # Если передан client (StoreClient.create()), используются его сессия, ограничитель
+    # и пул процессов, а параметры parse_workers/max_*/rate_limit игнорируются.
+    # use_catalog=True: для каждого региона один раз обходится каталог игр, и запросы
+    # разрешаются по нему; поиск магазина используется только для не найденных в каталоге.
+    # В конце в лог выводится сводка метрик клиента; metrics_file — куда их сохранить
+    # (.json — JSON, иначе текстовый формат Prometheus).
+    # snapshot (режим изменений): сначала проверяются недавно изменившиеся и недавно вышедшие
+    # игры, затем новые, затем остальные; пары без изменений за несколько прогонов пропускаются,
+    # и в таблицу идёт их строка из снимка. В конце снимок обновляется, а изменившиеся ячейки
+    # пишутся в diff_file.
+    # extra_outputs: дополнительные файлы результатов (.csv, .jsonl, .parquet) — по записи
+    # на каждую (игра, регион, платформа, язык), пишутся по мере готовности строк.
+    # shard: проверяются только пары этого шарда (см. sharding.Shard), остальные — другими процессами.
+    # schedule=True: пары упорядочиваются планировщиком (см. scheduler.schedule_pairs) — сначала
+    # отсутствующие или устаревшие в кэше, регионы чередуются, медленные регионы идут раньше.
+    # Задержки регионов берутся из кэша (прошлые прогоны) и метрик клиента и обновляются в конце.
+    header, table_header = table_header_md(platform, lang_code)
+    checkpoint_platform = platform_key(platform)
+    checkpoint_lang = "+".join(as_list(lang_code))
 
     logger.info(header.strip())
     logger.info(table_header.strip())
 
-    # Создаем семафор для ограничения параллельных запросов
-    semaphore = asyncio.Semaphore(max_parallel_requests)
+    # Задачи определения concept ID, по одной на игру
+    concept_tasks: Dict[str, asyncio.Task] = {}
+
+    # Задачи обхода каталога, по одной на регион; запускаются при первом обращении
+    catalog_tasks: Dict[str, asyncio.Task] = {}
+
+    def region_catalog(region: str) -> Optional[CatalogLoader]:
+        if not use_catalog:
+            return None
+
+        async def load():
+            if region not in catalog_tasks:
+                catalog_tasks[region] = asyncio.ensure_future(crawl_catalog_async(client, region, platform))
+            return await catalog_tasks[region]
+
+        return load
 
     async def process_game_region(game: str, region: str):
-        async with semaphore:
-            return await check_single_game_language_for_region_md_async(
-                session,
+        if by_concept:
+            if game not in concept_tasks:
+                concept_tasks[game] = asyncio.ensure_future(
+                    resolve_concept_async(client, game, regions, platform, cache)
+                )
+            concept = await concept_tasks[game]
+            return await check_single_game_language_by_concept_md_async(
+                client,
                 game,
                 region,
+                concept,
                 platform,
-                lang_code
+                lang_code,
+                cache
             )
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for game in games:
-            for region in regions:
-                tasks.append(process_game_region(game, region))
+        return await check_single_game_language_for_region_md_async(
+            client,
+            game,
+            region,
+            platform,
+            lang_code,
+            cache,
+            region_catalog(region)
+        )
+
+    # Без планировщика и снимка пары игра × регион выдаются воркерам лениво, и память
+    # не растёт с размером прогона; иначе их приходится упорядочить заранее
+    pairs = enumerate(
+        (game, region) for game in games for region in regions if shard is None or shard.owns(game, region)
+    )
+    if schedule:
+        latencies = cache.get_region_latencies() if cache else {}
+        if client:
+            latencies.update(client.metrics.region_latencies())
+
+        def tier(game: str, region: str) -> tuple:
+            return (
+                snapshot.priority(game, region, checkpoint_platform, checkpoint_lang) if snapshot else 0,
+                bool(cache) and cache.is_cached(region, game, checkpoint_platform),
+            )
 
-        # Запускаем все задачи параллельно
-        results = await asyncio.gather(*tasks)
+        pairs = iter(schedule_pairs(pairs, latencies, tier))
+    elif snapshot:
+        pairs = iter(sorted(pairs, key=lambda item: snapshot.priority(*item[1], checkpoint_platform, checkpoint_lang)))
+    sorted_rows = []
+    failed_rows: Dict[tuple, List[str]] = {}
+    # Проверенные строки нужны только для обновления снимка; без него память не растёт с размером прогона
+    checked_rows: Dict[tuple, List[str]] = {}
 
-        # Записываем результаты в файл
-        for result in results:
-            if result:
+    with open(output_file, "w", encoding="utf-8") as f, ExitStack() as outputs:
+        f.write(header)
+        f.write(table_header)
+        f.flush()
+        writers = [outputs.enter_context(writer) for writer in create_writers(extra_outputs)]
+
+        def write_records(game: str, region: str, result: List[str]):
+            records = records_from_row(game, region, checkpoint_platform, checkpoint_lang, result)
+            for writer in writers:
+                writer.write(records)
+
+        async def worker():
+            # Воркеров столько, сколько максимум допускает ограничитель; реальную
+            # параллельность запросов определяет он сам
+            for index, (game, region) in pairs:
+                done = checkpoint.get(game, region, checkpoint_platform, checkpoint_lang) if checkpoint else None
+                if done:
+                    if writers:
+                        write_records(game, region, done)
+                    continue
+
+                if snapshot and snapshot.should_skip(game, region, checkpoint_platform, checkpoint_lang):
+                    logger.info(f"⏭️ {game} ({region}): без изменений несколько прогонов, берём из снимка")
+                    result = snapshot.get(game, region, checkpoint_platform, checkpoint_lang)
+                else:
+                    result = await process_game_region(game, region)
+                    if snapshot and result and result[2] != ERROR_MARK:
+                        checked_rows[(game, region)] = result
+                if not result:
+                    continue
+                # Ошибки поиска и получения языков не журналируем, чтобы перепроверить их при продолжении
+                if checkpoint:
+                    if is_completed_row(result):
+                        checkpoint.append(game, region, checkpoint_platform, checkpoint_lang, result)
+                    else:
+                        failed_rows[(game, region)] = result
                 row_str = f"| {' | '.join(result)} |\n"
-                with open(output_file, "a", encoding="utf-8") as f:
-                    f.write(row_str)
+                f.write(row_str)
+                f.flush()
+                if writers:
+                    write_records(game, region, result)
                 logger.info(row_str.strip())
+                if sort_results:
+                    sorted_rows.append((index, row_str))
+
+        own_client = client is None
+        if own_client:
+            client = StoreClient.create(parse_workers, rate_limit, max_parallel_requests, max_concurrency)
+        try:
+            await asyncio.gather(*(worker() for _ in range(client.max_concurrency)))
+            if client.limiter:
+                logger.info(f"📈 Текущая параллельность запросов: {client.limiter.concurrency}")
+            logger.info(client.metrics.summary())
+            if cache:
+                cache.update_region_latencies(client.metrics.region_latencies())
+            if metrics_file:
+                client.metrics.export(metrics_file)
+        finally:
+            if own_client:
+                await client.close()
+
+    if checkpoint:
+        # Собираем полную таблицу из журнала и ошибок текущего прогона
+        rows = []
+        for game in games:
+            for region in regions:
+                result = checkpoint.get(game, region, checkpoint_platform, checkpoint_lang) or failed_rows.get((game, region))
+                if result:
+                    rows.append(f"| {' | '.join(result)} |\n")
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(header)
+            f.write(table_header)
+            f.writelines(rows)
+    elif sort_results:
+        sorted_rows.sort()
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(header)
+            f.write(table_header)
+            f.writelines(row_str for _, row_str in sorted_rows)
+
+    if snapshot:
+        # Пары, проверенные в прерванном прогоне, берём из журнала
+        changes: List[CellChange] = []
+        for game in games:
+            for region in regions:
+                result = checked_rows.get((game, region))
+                if result is None and checkpoint and not snapshot.should_skip(
+                        game, region, checkpoint_platform, checkpoint_lang):
+                    result = checkpoint.get(game, region, checkpoint_platform, checkpoint_lang)
+                if result:
+                    changes += snapshot.record(
+                        game, region, checkpoint_platform, checkpoint_lang, result,
+                        release_date_of(client, cache, result[-1])
+                    )
+        snapshot.save()
+        logger.info(f"🔔 Изменившихся ячеек: {len(changes)}")
+        if diff_file:
+            with open(diff_file, "w", encoding="utf-8") as f:
+                f.write(diff_table_md(changes))
+
+
+# Синхронные версии для обратной совместимости: тонкие обёртки над асинхронным движком.
+# Каждый вызов запускает свой event loop (asyncio.run), поэтому вызывать их из
+# асинхронного кода нельзя — там нужны *_async версии.
+def run_with_client(func, *args, **kwargs):
+    # Выполняет асинхронную функцию func(client, ...) с временным StoreClient
+    async def run():
+        async with StoreClient.create() as client:
+            return await func(client, *args, **kwargs)
+
+    return asyncio.run(run())
 
 
-# Оставляем синхронные версии для обратной совместимости
 def retry_request(func, *args, retries=RETRY_ATTEMPTS, delay=RETRY_DELAY, fallback=None):
     # Повторная попытка вызова функции с экспоненциальной задержкой.
+    # Для синхронных обёрток ниже повторяется их асинхронная версия в одном event loop
+    # (сами обёртки внутри event loop вызывать нельзя); прочие функции вызываются как есть.
+    async_func = ASYNC_VERSIONS.get(func)
+    if async_func:
+        async def call(client, *call_args):
+            return await retry_request_async(
+                async_func, client, *call_args, retries=retries, delay=delay, fallback=fallback, metrics=client.metrics
+            )
+
+        return run_with_client(call, *args)
+
     for attempt in range(1, retries + 1):
         try:
             return func(*args)
         except Exception as e:
             if attempt < retries:
-                logger.warning(f"⚠️ Ошибка: {e}. Ретрай через {delay}с... (попытка {attempt}/{retries})")
-                time.sleep(delay)
+                wait = backoff_delay(attempt, delay, getattr(e, "retry_after", None))
+                logger.warning(f"⚠️ Ошибка: {e}. Ретрай через {wait:.1f}с... (попытка {attempt}/{retries})")
+                time.sleep(wait)
             else:
                 logger.error(f"❌ Ошибка: {e}. Пропускаем (после {retries} попыток)")
                 return fallback
     return None
 
 
-def search_game(region, query, platform):
-    # Ищет игру в PS Store и возвращает её URL.
-    url = f"https://store.playstation.com/{region}/search/{query.lower().replace(' ', '%20').replace('-', '%20')}"
-    resp = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    # Получаем максимум 20 карточек
-    product_cards = soup.select('a[href*="/product/"]')[:20]
-    candidates = []
-
-    for a_tag in product_cards:
-        href = a_tag.get("href", "")
-        full_url = "https://store.playstation.com" + href
-        text = a_tag.get_text()
-
-        if "unavailable" in text.lower() or "pre-order" in text.lower() or "announced" in text.lower():
-            continue
-
-        if not text.lower().strip().startswith("ps5") and not text.lower().strip().startswith("ps4"):
-            continue
-
-        if not is_card_game(a_tag):
-            continue
-
-        candidates.append((text, full_url))
+async def search_game_url_async(
+        client: StoreClient,
+        region: str,
+        query: str,
+        platform: Union[str, Sequence[str]]
+) -> Optional[str]:
+    # URL найденной игры — результат синхронной search_game
+    match = await search_game_async(client, region, query, platform)
+    return match['url'] if match else None
 
-    # Ищем карточку с упоминанием и ps4/ps5
-    for text, url in candidates:
-        if platform.lower() in text.lower():
-            return url
 
-    return None
+def search_game(region, query, platform):
+    # Ищет игру в PS Store и возвращает её URL.
+    return run_with_client(search_game_url_async, region, query, platform)
 
 
 def get_languages(game_url):
     # Получает доступные языки для игры.
-    resp = requests.get(game_url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
-    if not script_tag:
-        raise Exception("❌ JSON-блок __NEXT_DATA__ не найден")
+    return run_with_client(get_languages_async, game_url)
 
-    text = script_tag.string.replace('\\"', '"')
 
-    # Найдём ВСЕ вложенные JSON-строки, содержащие нужные типы
-    voice_jsons = re.findall(r'\{[^{}]*"__typename":"SpokenLanguagesByPlatformElement"[^{}]*\}', text)
-    sub_jsons = re.findall(r'\{[^{}]*"__typename":"ScreenLanguagesByPlatformElement"[^{}]*\}', text)
-
-    result = {
-        'ps5_voice': [],
-        'ps5_subs': [],
-        'ps4_voice': [],
-        'ps4_subs': [],
-    }
-
-    def parse_json_block(raw, field, prefix):
-        try:
-            data = json.loads(raw)
-            platform = data.get("platform", "").lower()
-            if platform in ["ps4", "ps5"]:
-                result[f"{platform}_{prefix}"] = data.get(field, [])
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка при парсинге блока: {e}")
-
-    for j in voice_jsons:
-        parse_json_block(j, "spokenLanguages", "voice")
-
-    for j in sub_jsons:
-        parse_json_block(j, "screenLanguages", "subs")
-
-    return result
-
-
-def check_single_game_language_for_region_md(game_query, region, platform='ps5', lang_code='ru'):
+def check_single_game_language_for_region_md(game_query, region, platform='ps5', lang_code='ru', cache=None):
     # Проверяет наличие языка для одной игры в одном регионе.
-    url = retry_request(search_game, region, game_query, platform)
-    if not url:
-        return [game_query, region.split('-')[-1].upper()] + ["❌"] * 6 + ["Игра не найдена или ошибка запроса"]
-
-    langs = retry_request(get_languages, url)
-    if not langs:
-        return [game_query, region.split('-')[-1].upper()] + ["Ошибка"] * 6 + ["Не удалось получить языки"]
-
-    has_ps5 = bool(langs['ps5_voice'] or langs['ps5_subs'])
-    has_ps4 = bool(langs['ps4_voice'] or langs['ps4_subs'])
-
-    if platform.lower() == "ps5":
-        return [
-            game_query,
-            region.split('-')[-1].upper(),
-            yesno_md(has_ps5),
-            yesno_md(lang_code in langs['ps5_voice']),
-            yesno_md(lang_code in langs['ps5_subs']),
-            url
-        ]
-    if platform.lower() == "ps4":
-        return [
-            game_query,
-            region.split('-')[-1].upper(),
-            yesno_md(has_ps4),
-            yesno_md(lang_code in langs['ps4_voice']),
-            yesno_md(lang_code in langs['ps4_subs']),
-            url
-        ]
-    return None
-
-
-def check_multiple_games_languages_md(games, regions, platform='ps5', lang_code='ru', output_file='output.md'):
-    # Проверяет наличие языков для нескольких игр в нескольких регионах.
-    header = f"### 🎮 Проверка языков для игр (язык: {lang_code})\n\n"
-    table_header = (
-        f"| Игра | Регион | {platform.upper()} | Озв. | Суб. | URL |\n"
-        "|------|--------|-----|------|------|-----|\n"
+    return run_with_client(
+        check_single_game_language_for_region_md_async, game_query, region, platform, lang_code, cache
     )
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(header)
-        f.write(table_header)
 
-        logger.info(header.strip())
-        logger.info(table_header.strip())
-
-        for game in games:
-            for region in regions:
-                row = check_single_game_language_for_region_md(game, region, platform, lang_code)
-                row_str = f"| {' | '.join(row)} |\n"
-                f.write(row_str)
-                logger.info(row_str.strip())
+def check_multiple_games_languages_md(games, regions, platform='ps5', lang_code='ru', output_file='output.md', **kwargs):
+    # Проверяет наличие языков для нескольких игр в нескольких регионах.
+    # Пары игра × регион проверяются параллельно; остальные параметры
+    # (cache, checkpoint, sort_results, ...) — как у check_multiple_games_languages_md_async.
+    # Как и прежде, таблица по умолчанию упорядочена игра → регион.
+    kwargs.setdefault("sort_results", True)
+    asyncio.run(check_multiple_games_languages_md_async(games, regions, platform, lang_code, output_file, **kwargs))
+
+
+# Асинхронные версии синхронных обёрток, которые повторяет retry_request
+ASYNC_VERSIONS = {
+    search_game: search_game_url_async,
+    get_languages: get_languages_async,
+    check_single_game_language_for_region_md: check_single_game_language_for_region_md_async,
+}
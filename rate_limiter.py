@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from constants import (
+    MAX_PARALLEL_REQUESTS, MAX_CONCURRENCY, RATE_LIMIT_PER_SECOND,
+    BACKOFF_INTERVAL, RETRY_MAX_DELAY
+)
+
+
+def backoff_delay(attempt: int, delay: float, retry_after: Optional[float] = None) -> float:
+    # Экспоненциальная задержка с джиттером; Retry-After от сервера имеет приоритет, если он больше
+    backoff = min(RETRY_MAX_DELAY, delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+    if retry_after:
+        return max(backoff, retry_after)
+    return backoff
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Разбирает заголовок Retry-After: число секунд или HTTP-дата
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    # Ограничитель нагрузки на один хост:
+    #   - token bucket ограничивает частоту запросов (rate в секунду); в корзине помещается
+    #     не меньше одного токена, иначе при rate < 1 запрос никогда бы не дождался токена;
+    #   - число одновременных запросов подбирается по AIMD: растёт на 1 за каждое «окно»
+    #     успешных ответов и уменьшается вдвое на 429/5xx/таймаутах (не чаще раза в BACKOFF_INTERVAL);
+    #   - Retry-After приостанавливает выдачу новых запросов до указанного времени.
+
+    def __init__(
+            self,
+            rate: float = RATE_LIMIT_PER_SECOND,
+            initial_concurrency: int = MAX_PARALLEL_REQUESTS,
+            max_concurrency: int = MAX_CONCURRENCY,
+            min_concurrency: int = 1
+    ):
+        if rate <= 0:
+            raise ValueError(f"Частота запросов должна быть больше нуля: {rate}")
+        self.rate = rate
+        self.capacity = max(1.0, float(rate))
+        self.tokens = self.capacity
+        self.refilled_at = time.monotonic()
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, initial_concurrency)
+        self.limit = float(initial_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.condition = asyncio.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.min_concurrency, int(self.limit))
+
+    def _take_token(self) -> float:
+        # Забирает токен и возвращает 0, либо возвращает время ожидания следующего токена
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+
+        try:
+            while True:
+                wait = self._take_token()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            # Отмена во время ожидания токена: место освобождается, иначе оно потеряно навсегда
+            async with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+            raise
+
+    async def release(self, healthy: bool, retry_after: Optional[float] = None) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if healthy:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif now - self.decreased_at >= BACKOFF_INTERVAL:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.decreased_at = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self.condition.notify_all()
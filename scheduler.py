@@ -0,0 +1,46 @@
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Пара с порядковым номером в сетке игра × регион: (номер, (игра, регион))
+IndexedPair = Tuple[int, Tuple[str, str]]
+
+
+def schedule_pairs(
+        pairs: Iterable[IndexedPair],
+        latencies: Optional[Dict[str, float]] = None,
+        tier: Optional[Callable[[str, str], tuple]] = None
+) -> List[IndexedPair]:
+    # Порядок проверки пар:
+    #   - сначала пары с меньшим tier(игра, регион) (например, не найденные в кэше);
+    #   - внутри уровня регионы чередуются, чтобы нагрузка распределялась по ним равномерно;
+    #   - медленные регионы (по задержкам прошлых прогонов) получают пары чаще, поэтому их
+    #     очередь заканчивается раньше и не растягивает хвост прогона. Регионы без замеров
+    #     считаются самыми медленными — так их задержка быстрее становится известна.
+    # Используется stride scheduling: у региона шаг 1/задержка, следующим берётся регион
+    # с наименьшим накопленным проходом.
+    latencies = latencies or {}
+    default_latency = max(latencies.values(), default=1.0)
+
+    levels: Dict[tuple, Dict[str, List[IndexedPair]]] = {}
+    for item in pairs:
+        game, region = item[1]
+        level = tier(game, region) if tier else ()
+        levels.setdefault(level, {}).setdefault(region, []).append(item)
+
+    ordered: List[IndexedPair] = []
+    for level in sorted(levels):
+        queues = levels[level]
+        heap = []
+        for position, region in enumerate(sorted(queues, key=lambda r: -latencies.get(r, default_latency))):
+            stride = 1 / max(latencies.get(region, default_latency), 1e-3)
+            heap.append((stride, position, region, stride))
+        heapq.heapify(heap)
+        cursors = {region: 0 for region in queues}
+
+        while heap:
+            passed, position, region, stride = heapq.heappop(heap)
+            ordered.append(queues[region][cursors[region]])
+            cursors[region] += 1
+            if cursors[region] < len(queues[region]):
+                heapq.heappush(heap, (passed + stride, position, region, stride))
+    return ordered
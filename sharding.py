@@ -0,0 +1,29 @@
+import os
+import zlib
+from typing import NamedTuple
+
+
+class Shard(NamedTuple):
+    # Часть пространства игра × регион для одного процесса или машины: «index/count», index от 1.
+    # Пара попадает в шард по crc32 от игры и региона, поэтому разбиение не зависит
+    # от порядка и состава списков и одинаково на всех машинах.
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Shard":
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            raise ValueError(f"Шард задаётся как i/N, например 1/4: {value}") from None
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Номер шарда должен быть от 1 до N: {value}")
+        return cls(index, count)
+
+    def owns(self, game: str, region: str) -> bool:
+        return zlib.crc32(f"{game}\n{region}".encode("utf-8")) % self.count == self.index - 1
+
+    def path(self, path: str) -> str:
+        # Имя файла шарда: games.md → games.shard1of4.md
+        root, extension = os.path.splitext(path)
+        return f"{root}.shard{self.index}of{self.count}{extension}"
@@ -0,0 +1,158 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from checkpoint import CheckpointJournal, CheckpointKey, upgrade_row
+from constants import ERROR_MARK, SNAPSHOT_FILE, STABLE_RUNS_TO_SKIP, STABLE_RECHECK_INTERVAL, RECENT_PERIOD
+
+# Приоритеты пар в прогоне: меньше — раньше
+PRIORITY_RECENT = 0  # недавно изменилась или недавно вышла (или ещё не вышла)
+PRIORITY_NEW = 1     # ещё не проверялась
+PRIORITY_REGULAR = 2
+
+
+class CellChange(NamedTuple):
+    game: str
+    region: str
+    platform: str
+    column: str   # "Наличие", "Озв. ru", "Суб. ru"
+    before: str
+    after: str
+    url: str
+
+
+def row_cells(platform: str, lang_code: str, row: List[str]) -> List[Tuple[str, str, str]]:
+    # Раскладывает строку таблицы на ячейки (платформа, колонка, значение).
+    # Порядок колонок как в build_row_md: для каждой платформы наличие,
+    # затем озвучка и субтитры по каждому языку; колонки совпадения не сравниваются
+    platforms = platform.split("+")
+    lang_codes = lang_code.split("+")
+    marks = iter(row[2:-1])
+    cells = []
+    for p in platforms:
+        cells.append((p, "Наличие", next(marks, "")))
+        for code in lang_codes:
+            cells.append((p, f"Озв. {code}", next(marks, "")))
+            cells.append((p, f"Суб. {code}", next(marks, "")))
+    return cells
+
+
+def parse_release_date(value: Optional[str]) -> Optional[float]:
+    # Дата выхода из страницы продукта ("2025-04-25T00:00:00Z") в timestamp
+    if not value:
+        return None
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+class ResultSnapshot:
+    # Снимок результатов прошлых прогонов для режима изменений: по каждой проверке
+    # (игра, регион, платформа, язык) хранится последняя строка таблицы, время последней
+    # проверки и изменения, число прогонов подряд без изменений и дата выхода игры.
+    # Файл перезаписывается целиком в save(), поэтому прерванный прогон снимок не портит.
+
+    def __init__(
+            self,
+            path: str = SNAPSHOT_FILE,
+            stable_runs: int = STABLE_RUNS_TO_SKIP,
+            recheck_interval: float = STABLE_RECHECK_INTERVAL,
+            recent_period: float = RECENT_PERIOD
+    ):
+        self.path = path
+        self.stable_runs = stable_runs
+        self.recheck_interval = recheck_interval
+        self.recent_period = recent_period
+        self.entries: Dict[CheckpointKey, Dict[str, Any]] = self.load()
+
+    def load(self) -> Dict[CheckpointKey, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        for e in data.get("entries", []):
+            e["row"] = upgrade_row(e["platform"], e["lang"], e["row"])
+        return {
+            CheckpointJournal.make_key(e["game"], e["region"], e["platform"], e["lang"]): e
+            for e in data.get("entries", [])
+        }
+
+    def save(self) -> None:
+        # Пишем во временный файл и подменяем, чтобы не оставить обрезанный снимок
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": list(self.entries.values())}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, game: str, region: str, platform: str, lang_code: str) -> Optional[List[str]]:
+        entry = self.entries.get(CheckpointJournal.make_key(game, region, platform, lang_code))
+        return entry["row"] if entry else None
+
+    def _is_recent(self, entry: Dict[str, Any], now: float) -> bool:
+        if now - entry.get("changed_at", 0) < self.recent_period:
+            return True
+        released = parse_release_date(entry.get("release_date"))
+        return released is not None and now - released < self.recent_period
+
+    def priority(self, game: str, region: str, platform: str, lang_code: str) -> int:
+        entry = self.entries.get(CheckpointJournal.make_key(game, region, platform, lang_code))
+        if entry is None:
+            return PRIORITY_NEW
+        return PRIORITY_RECENT if self._is_recent(entry, time.time()) else PRIORITY_REGULAR
+
+    def should_skip(self, game: str, region: str, platform: str, lang_code: str) -> bool:
+        # Пропускаем пары, стабильные stable_runs прогонов подряд, если они проверялись
+        # недавно и игра не новая
+        entry = self.entries.get(CheckpointJournal.make_key(game, region, platform, lang_code))
+        if entry is None or entry["stable_runs"] < self.stable_runs:
+            return False
+        now = time.time()
+        return now - entry["checked_at"] < self.recheck_interval and not self._is_recent(entry, now)
+
+    def record(
+            self,
+            game: str,
+            region: str,
+            platform: str,
+            lang_code: str,
+            row: List[str],
+            release_date: Optional[str] = None
+    ) -> List[CellChange]:
+        # Сохраняет результат проверки и возвращает изменившиеся ячейки
+        # (для пар, которых ещё не было в снимке, изменений нет).
+        # Строки ошибок — не результат проверки: снимок и счётчик стабильных прогонов не меняются
+        if row[2] == ERROR_MARK:
+            return []
+        key = CheckpointJournal.make_key(game, region, platform, lang_code)
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = {
+                "game": game, "region": region, "platform": platform.lower(), "lang": lang_code,
+                "row": row, "checked_at": now, "changed_at": 0, "stable_runs": 0,
+                "release_date": release_date,
+            }
+            return []
+
+        changes = [
+            CellChange(game, row[1], p, column, before, after, row[-1])
+            for (p, column, before), (_, _, after) in zip(
+                row_cells(key[2], lang_code, entry["row"]), row_cells(key[2], lang_code, row)
+            )
+            if before != after
+        ]
+        if changes:
+            entry["changed_at"] = now
+            entry["stable_runs"] = 0
+        else:
+            entry["stable_runs"] += 1
+        entry["row"] = row
+        entry["checked_at"] = now
+        entry["release_date"] = release_date or entry.get("release_date")
+        return changes
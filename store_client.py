@@ -0,0 +1,245 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from constants import (
+    get_random_headers, REQUEST_TIMEOUT, CONNECT_TIMEOUT, DNS_CACHE_TTL, KEEPALIVE_TIMEOUT,
+    MAX_PARALLEL_REQUESTS, MAX_CONCURRENCY, RATE_LIMIT_PER_SECOND, PARSE_WORKERS, STORE_URL
+)
+from http_cache import HttpCache
+from metrics import Metrics, region_from_url, stage_from_url
+from rate_limiter import AdaptiveLimiter, parse_retry_after
+
+# aiohttp импортируется только при создании сессии, чтобы импорт модуля был лёгким
+if TYPE_CHECKING:
+    import aiohttp
+
+
+def create_timeout() -> "aiohttp.ClientTimeout":
+    # Таймауты запроса: общий и на установку соединения
+    import aiohttp
+
+    return aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def create_session(
+        max_concurrency: int = MAX_CONCURRENCY,
+        metrics: Optional[Metrics] = None
+) -> "aiohttp.ClientSession":
+    # Создаёт сессию с настроенным пулом соединений: keep-alive, кэш DNS и
+    # лимит соединений на хост под максимальную параллельность.
+    # Если переданы metrics, в них пишется время DNS и установки соединений.
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(
+        limit=max_concurrency * 2,
+        limit_per_host=max_concurrency,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=create_timeout(),
+        auto_decompress=True,
+        trace_configs=[metrics.trace_config()] if metrics else None
+    )
+
+
+def wire_size(resp: "aiohttp.ClientResponse", body: bytes) -> int:
+    # Размер ответа по сети (тело приходит уже распакованным): Content-Length, иначе
+    # счётчик сырых байтов потока (aiohttp 3.12+); в старых aiohttp для сжатого ответа
+    # без Content-Length остаётся только размер распакованного тела
+    if resp.content_length is not None:
+        return resp.content_length
+    raw = getattr(resp.content, "total_raw_bytes", None)
+    return raw if raw is not None else len(body)
+
+
+class StoreHTTPError(Exception):
+    # Ответ, после которого запрос стоит повторить позже (429 или 5xx)
+    def __init__(self, status: int, url: str, retry_after: Optional[float] = None):
+        super().__init__(f"❌ HTTP {status}: {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class StoreClient:
+    # Общая точка доступа к PS Store для асинхронных функций: загрузка страниц через
+    # aiohttp-сессию и разбор HTML. Если задан parse_executor (например, ProcessPoolExecutor),
+    # разбор выполняется в нём, а event loop в это время продолжает скачивать страницы.
+    # Если задан limiter, каждый запрос проходит через него и сообщает ему о своём исходе.
+    # Клиент, созданный через StoreClient.create(), сам владеет сессией и пулом процессов
+    # и закрывает их при выходе из async with; его можно использовать для нескольких прогонов.
+    # Одинаковые одновременные запросы выполняются один раз (single-flight), а результаты
+    # разбора запоминаются на время жизни клиента.
+    # В metrics собираются длительности загрузки и разбора, статусы ответов и трафик.
+    # base_url подменяет адрес магазина при загрузке (например, локальный сервер для бенчмарков),
+    # URL в результатах при этом остаются адресами магазина.
+    # Если задан http_cache, страницы запрашиваются условно (If-None-Match/If-Modified-Since);
+    # на ответ 304 тело берётся из кэша, а сохранённый результат разбора используется без повторного разбора.
+
+    def __init__(
+            self,
+            session: "aiohttp.ClientSession",
+            parse_executor: Optional[Executor] = None,
+            limiter: Optional[AdaptiveLimiter] = None,
+            owned: bool = False,
+            metrics: Optional[Metrics] = None,
+            base_url: Optional[str] = None,
+            http_cache: Optional[HttpCache] = None
+    ):
+        self.session = session
+        self.parse_executor = parse_executor
+        self.limiter = limiter
+        self.timeout = create_timeout()
+        self.owned = owned
+        self.metrics = metrics or Metrics()
+        self.base_url = base_url
+        self.http_cache = http_cache
+        # URL, которые в этом клиенте подтверждены ответом 304
+        self.not_modified: Set[str] = set()
+        self.in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.memo: Dict[Hashable, Any] = {}
+
+    @classmethod
+    def create(
+            cls,
+            parse_workers: int = PARSE_WORKERS,
+            rate_limit: float = RATE_LIMIT_PER_SECOND,
+            initial_concurrency: int = MAX_PARALLEL_REQUESTS,
+            max_concurrency: int = MAX_CONCURRENCY,
+            base_url: Optional[str] = None,
+            http_cache: Optional[HttpCache] = None
+    ) -> "StoreClient":
+        # Создаёт клиента со своей сессией, ограничителем и, при parse_workers > 0, пулом процессов
+        limiter = AdaptiveLimiter(rate_limit, initial_concurrency, max_concurrency)
+        parse_executor = None
+        if parse_workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+            parse_executor = ProcessPoolExecutor(parse_workers)
+        metrics = Metrics()
+        session = create_session(limiter.max_concurrency, metrics)
+        return cls(session, parse_executor, limiter, owned=True, metrics=metrics, base_url=base_url,
+                   http_cache=http_cache)
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.limiter.max_concurrency if self.limiter else MAX_PARALLEL_REQUESTS
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self) -> None:
+        if not self.owned:
+            return
+        await self.session.close()
+        if self.parse_executor:
+            self.parse_executor.shutdown()
+
+    async def _fetch(self, url: str) -> str:
+        headers = get_random_headers()
+        region = region_from_url(url)
+        fetch_url = self.base_url + url[len(STORE_URL):] if self.base_url and url.startswith(STORE_URL) else url
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached:
+            headers.update(cached.conditional_headers())
+
+        with self.metrics.timer(f"download.{stage_from_url(url)}", region):
+            async with self.session.get(fetch_url, headers=headers, timeout=self.timeout) as resp:
+                self.metrics.count_status(region, resp.status)
+                if resp.status == 429 or resp.status >= 500:
+                    raise StoreHTTPError(resp.status, url, parse_retry_after(resp.headers.get("Retry-After")))
+                if resp.status == 304 and cached:
+                    self.not_modified.add(url)
+                    self.http_cache.touch(url)
+                    return cached.text()
+
+                body = await resp.read()
+                self.metrics.add_bytes(region, wire_size(resp, body))
+                text = await resp.text()
+                etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+                if self.http_cache and resp.status == 200 and (etag or last_modified):
+                    self.not_modified.discard(url)
+                    self.http_cache.store(url, etag, last_modified, text)
+                return text
+
+    async def single_flight(self, key: Hashable, factory: Callable[[], Awaitable[Any]], memoize: bool = False) -> Any:
+        # Выполняет factory() один раз для всех одновременных вызовов с одинаковым ключом.
+        # Ошибку получают все ожидающие; при memoize успешный результат сохраняется.
+        if key in self.memo:
+            return self.memo[key]
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self.in_flight[key] = future
+
+            def done(f: asyncio.Future):
+                self.in_flight.pop(key, None)
+                if memoize and not f.cancelled() and f.exception() is None:
+                    self.memo[key] = f.result()
+
+            future.add_done_callback(done)
+
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(future)
+
+    async def get_text(self, url: str) -> str:
+        # Загружает страницу и возвращает её текст; одновременные запросы одного URL объединяются
+        return await self.single_flight(("text", url), lambda: self._get_text(url))
+
+    async def fetch_parsed(self, url: str, func: Callable[..., Any], *args) -> Any:
+        # Загружает страницу и разбирает её func(text, *args); результат запоминается
+        async def load():
+            text = await self.get_text(url)
+            if self.http_cache is None:
+                return await self.parse(func, text, *args)
+
+            # Страница не изменилась с прошлого разбора — берём сохранённый результат
+            key = json.dumps([func.__name__, args], ensure_ascii=False)
+            if url in self.not_modified:
+                parsed = self.http_cache.get_parsed(url, key)
+                if parsed is not None:
+                    self.metrics.observe(f"parse.{func.__name__}.cached", 0.0)
+                    return parsed
+            parsed = await self.parse(func, text, *args)
+            if parsed is not None:
+                self.http_cache.set_parsed(url, key, parsed)
+            return parsed
+
+        return await self.single_flight(("parsed", url, func.__name__, args), load, memoize=True)
+
+    def peek_parsed(self, url: str, func: Callable[..., Any], *args) -> Any:
+        # Уже запомненный результат fetch_parsed без загрузки, иначе None
+        return self.memo.get(("parsed", url, func.__name__, args))
+
+    async def _get_text(self, url: str) -> str:
+        if self.limiter is None:
+            return await self._fetch(url)
+
+        await self.limiter.acquire()
+        healthy = False
+        retry_after = None
+        try:
+            text = await self._fetch(url)
+            healthy = True
+            return text
+        except StoreHTTPError as e:
+            retry_after = e.retry_after
+            raise
+        finally:
+            await self.limiter.release(healthy, retry_after)
+
+    async def parse(self, func: Callable[..., Any], *args) -> Any:
+        # Выполняет функцию разбора; func должна быть функцией уровня модуля,
+        # а аргументы и результат — простыми объектами, чтобы их можно было передать в процесс
+        with self.metrics.timer(f"parse.{func.__name__}"):
+            if self.parse_executor is None:
+                return func(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parse_executor, func, *args)
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from constants import EDITION_WORDS, EDITION_PHRASES
+
+# Уровень уверенности, ниже которого совпадение считается сомнительным
+MIN_MATCH_SCORE = 0.6
+
+# Штраф за издание (Deluxe, Complete и т.п.), если в запросе издание не указано
+EDITION_PENALTY = 0.05
+
+_EDITION_PHRASES_RE = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in EDITION_PHRASES) + r")\b")
+
+
+class PreparedTitle(NamedTuple):
+    normalized: str  # нормализованное название целиком
+    base: str        # название без слов издания и платформ
+    tokens: frozenset
+
+
+def normalize_title(title: str) -> str:
+    # Приводит название к виду для сравнения: нижний регистр, без диакритики,
+    # знаков ™/®/© и пунктуации, одиночные пробелы
+    title = re.sub(r"[™®©]", "", title)
+    title = unicodedata.normalize("NFKD", title.lower())
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", title).split())
+
+
+@lru_cache(maxsize=65536)
+def prepare_title(title: str) -> PreparedTitle:
+    # Нормализует название и отделяет базовое название от издания; результат кэшируется,
+    # поэтому один и тот же запрос во всех регионах разбирается один раз
+    normalized = normalize_title(title)
+    words = [w for w in _EDITION_PHRASES_RE.sub(" ", normalized).split() if w not in EDITION_WORDS]
+    base = " ".join(words) or normalized
+    return PreparedTitle(normalized, base, frozenset(base.split()))
+
+
+def title_similarity(query: str, title: str) -> float:
+    # Оценка похожести названия на запрос от 0 до 1: совпадение базовых названий,
+    # иначе максимум из доли общих слов и посимвольного сходства; издания слегка штрафуются
+    q = prepare_title(query)
+    t = prepare_title(title)
+
+    if q.base == t.base:
+        score = 1.0
+    else:
+        overlap = len(q.tokens & t.tokens) / len(q.tokens | t.tokens) if q.tokens | t.tokens else 0.0
+        ratio = SequenceMatcher(None, q.base, t.base).ratio()
+        score = max(overlap, ratio) * 0.95
+
+    if t.normalized != t.base and q.normalized == q.base and q.normalized != t.normalized:
+        score -= EDITION_PENALTY
+    return max(0.0, score)
+
+
+class TitleIndex:
+    # Индекс нормализованных названий с обратным индексом по словам: кандидаты для запроса
+    # берутся только среди названий с общими словами и ранжируются по title_similarity.
+
+    def __init__(self):
+        self.entries: List[Tuple[str, Any]] = []
+        self.by_token: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, title: str, payload: Any) -> None:
+        position = len(self.entries)
+        self.entries.append((title, payload))
+        for token in prepare_title(title).tokens:
+            self.by_token.setdefault(token, set()).add(position)
+
+    def rank(self, query: str, limit: Optional[int] = None) -> List[Tuple[float, str, Any]]:
+        # Возвращает (оценка, название, payload) по убыванию оценки; при равенстве — в порядке добавления
+        positions: Set[int] = set()
+        for token in prepare_title(query).tokens:
+            positions |= self.by_token.get(token, set())
+
+        scored = [(title_similarity(query, self.entries[i][0]), i) for i in positions]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        if limit is not None:
+            scored = scored[:limit]
+        return [(score, self.entries[i][0], self.entries[i][1]) for score, i in scored]